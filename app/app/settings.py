@@ -46,7 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so latency and response size cover the whole stack.
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,6 +89,9 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds to keep connections open between requests. Each thread
+        # keeps its own. By default each request opens a new one.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
@@ -108,6 +114,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Emails are matched ignoring case, passwords hashed with a concurrency cap.
+AUTHENTICATION_BACKENDS = ['core.backends.EmailBackend']
+
+# Passwords hashed at once per worker (core.passwords), defaulting to the
+# number of CPUs, and logins that may wait for their turn before a 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+PASSWORD_HASH_RETRY_AFTER = 1
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -139,10 +154,120 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Runs the tests with a throttle store of their own and no rate limits.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserRateThrottle',
+        'core.throttling.ScopedRateThrottle',
+    ],
+    # `user`/`anon` apply to every request, the others to views with a
+    # matching `throttle_scope`.
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '300/min',
+        'user': '1200/min',
+        'recipe': '600/min',
+        'recipe_attr': '600/min',
+        'token': '60/min',
+    },
+    # Anonymous requests are throttled per client IP. X-Forwarded-For is
+    # only trusted for this many proxies in front of the app, with 0 the
+    # address the server sees is used, so clients can't pick their own.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# Memory-mapped file holding the throttle buckets shared by all worker
+# processes on the host. Defaults to a file in the temp directory named
+# after this deployment, see `core.throttling.default_store_path`.
+THROTTLE_STORE_PATH = os.environ.get('THROTTLE_STORE_PATH')
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Response compression (core.middleware.CompressionMiddleware).
+# Brotli is used when the `brotli` package is installed, gzip otherwise.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Directory where each worker process shares its metrics, so /metrics
+# reports totals across workers. Without it, only the serving process is
+# reported. Samples of exited workers are merged into one aggregate file.
+# Workers are told apart by PID, so use a directory local to the host or
+# container.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+# /metrics is only served to staff users and to scrapers that send this
+# token as `Authorization: Bearer <token>`.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Slow query log (core.slow_queries). Queries slower than the threshold
+# are logged with their view and caller, sampled and capped per minute.
+# Set the threshold to None to turn the log off.
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', 1.0))
+SLOW_QUERY_MAX_PER_MINUTE = 10
+# EXPLAIN (ANALYZE, BUFFERS) runs the query again, so it is opt-in. The
+# plan shows the values of the params, like SLOW_QUERY_LOG_PARAMS.
+SLOW_QUERY_EXPLAIN = bool(int(os.environ.get('SLOW_QUERY_EXPLAIN', 0)))
+# Params can hold secrets such as token keys and password hashes, so only
+# their types are logged unless this is set while debugging.
+SLOW_QUERY_LOG_PARAMS = bool(
+    int(os.environ.get('SLOW_QUERY_LOG_PARAMS', 0))
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Seconds a worker may serve tag/ingredient autocomplete suggestions from
+# its in-process cache (recipe.autocomplete) before asking the database.
+AUTOCOMPLETE_CACHE_TTL = 30
+
+# Seconds per-user recipe statistics (recipe.stats) stay in the cache. Writes
+# drop them, in every worker only if CACHES points to a shared cache.
+RECIPE_STATS_CACHE_TTL = 300
+
+# Seconds a worker may answer similar recipe queries from its in-process
+# index of a user's tags and ingredients (recipe.similar).
+SIMILAR_RECIPES_CACHE_TTL = 60
+
+# Warm-up of workers (core.warmup), started when app.wsgi is loaded. 'boot'
+# warms up each worker in a background thread as it starts. /ready reports
+# 503 until that's done and the databases accept connections. Load the
+# application in each worker, not once before forking, as the thread
+# doesn't survive a fork.
+WARMUP = os.environ.get('WARMUP')
+
+# Auth tokens (core.authentication) expire TOKEN_TTL seconds after they were
+# created, or after they were last used with TOKEN_SLIDING. Uses are saved
+# in batches per worker, at most every TOKEN_ACTIVITY_FLUSH_INTERVAL
+# seconds, and only once the stored time is TOKEN_ACTIVITY_RESOLUTION old.
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 7 * 24 * 60 * 60))
+TOKEN_SLIDING = bool(int(os.environ.get('TOKEN_SLIDING', 0)))
+TOKEN_ACTIVITY_FLUSH_INTERVAL = 10
+TOKEN_ACTIVITY_RESOLUTION = 60
+
+# Signed access tokens (core.authentication.SignedTokenAuthentication) are
+# valid for ACCESS_TOKEN_TTL seconds, refresh tokens for REFRESH_TOKEN_TTL.
+# Each refresh token works once, refreshing returns the next one.
+# The user they belong to is cached for SIGNED_TOKEN_USER_CACHE_TTL seconds,
+# which bounds how long revoked tokens still work with a per-process cache.
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', 5 * 60))
+REFRESH_TOKEN_TTL = int(os.environ.get('REFRESH_TOKEN_TTL', TOKEN_TTL))
+SIGNED_TOKEN_USER_CACHE_TTL = 60
@@ -21,6 +21,8 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import metrics_view, readiness_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
@@ -31,6 +33,8 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', readiness_view, name='ready'),
 ]
 
 if settings.DEBUG:
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Imported once the apps are loaded.
+from core import warmup  # noqa: E402
+
+if settings.WARMUP == 'boot':
+    warmup.start()
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Connect the signal handlers.
+        from core import signals  # noqa: F401
+        from core import slow_queries  # noqa: F401
+        from core import metrics
+        metrics.start_process()
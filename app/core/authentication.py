@@ -0,0 +1,276 @@
+"""
+Token authentication with expiring tokens and signed access tokens.
+"""
+import logging
+import secrets
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    connection,
+    transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.models import RefreshToken, TokenActivity
+
+
+logger = logging.getLogger(__name__)
+
+UPSERT_SQL = '''
+INSERT INTO {activity} (token_id, last_used)
+SELECT v.key, v.last_used
+FROM (VALUES {values}) AS v (key, last_used)
+JOIN {token} AS t ON t.key = v.key
+ON CONFLICT (token_id) DO UPDATE
+SET last_used = GREATEST({activity}.last_used, EXCLUDED.last_used)
+'''
+
+ACCESS_SALT = 'core.authentication.access'
+REFRESH_SALT = 'core.authentication.refresh'
+
+# Fields of users kept in the cache for signed tokens.
+CACHED_USER_FIELDS = {'id', 'is_active', 'token_version'}
+
+
+def token_ttl():
+    """Return how long tokens are valid."""
+    return timedelta(seconds=getattr(settings, 'TOKEN_TTL', 7 * 86400))
+
+
+def expires_at(token):
+    """Return when a token expires."""
+    start = token.created
+    if getattr(settings, 'TOKEN_SLIDING', False):
+        activity = getattr(token, 'activity', None)
+        if activity is not None and activity.last_used > start:
+            start = activity.last_used
+    return start + token_ttl()
+
+
+def expired_filter(now=None):
+    """Return a `Q` matching the expired tokens."""
+    cutoff = (now or timezone.now()) - token_ttl()
+    expired = Q(created__lt=cutoff)
+    if getattr(settings, 'TOKEN_SLIDING', False):
+        expired &= (
+            Q(activity__isnull=True) | Q(activity__last_used__lt=cutoff)
+        )
+    return expired
+
+
+def issue_token(user):
+    """Return the user's token, replacing it if it has expired."""
+    with transaction.atomic():
+        # Concurrent logins wait here, so only one replaces an expired
+        # token and the others find the new one. The activity is on the
+        # nullable side of the join and can't be locked.
+        token = Token.objects.select_for_update(of=('self',)).select_related(
+            'activity',
+        ).filter(user=user).first()
+        if token is not None and expires_at(token) <= timezone.now():
+            token.delete()
+            return Token.objects.create(user=user)
+    if token is None:
+        # Created by a concurrent login meanwhile, or never issued.
+        token, _ = Token.objects.get_or_create(user=user)
+    return token
+
+
+class ActivityBuffer:
+    """
+    Collects when tokens were used and writes them in batches.
+
+    Each process keeps the latest use of every token in memory and
+    upserts them all in one statement at most once per
+    `TOKEN_ACTIVITY_FLUSH_INTERVAL` seconds. Uses within
+    `TOKEN_ACTIVITY_RESOLUTION` seconds of the stored time aren't
+    recorded at all, so a busy token costs a write every so often
+    instead of one per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, token, now=None):
+        """Note that `token` was used, flushing if it's time to."""
+        now = now or timezone.now()
+        resolution = getattr(settings, 'TOKEN_ACTIVITY_RESOLUTION', 60)
+        activity = getattr(token, 'activity', None)
+        if activity is not None and \
+                now - activity.last_used < timedelta(seconds=resolution):
+            return
+        interval = getattr(settings, 'TOKEN_ACTIVITY_FLUSH_INTERVAL', 10)
+        with self._lock:
+            self._pending[token.key] = now
+            due = time.monotonic() - self._last_flush >= interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending uses in one statement."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        sql = UPSERT_SQL.format(
+            activity=TokenActivity._meta.db_table,
+            token=Token._meta.db_table,
+            values=', '.join(['(%s, %s::timestamptz)'] * len(pending)),
+        )
+        params = [value for item in pending.items() for value in item]
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+        except DatabaseError:
+            # A token deleted meanwhile, the uses are only a hint anyway.
+            logger.warning('Unable to record token activity.', exc_info=True)
+
+
+activity_buffer = ActivityBuffer()
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication where tokens expire after `TOKEN_TTL` seconds.
+
+    With `TOKEN_SLIDING`, the lifetime counts from the last use instead
+    of the creation of the token.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user', 'activity').get(
+                key=key,
+            )
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        if expires_at(token) <= timezone.now():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        activity_buffer.record(token)
+        return (token.user, token)
+
+
+def signed_tokens(user):
+    """Return a signed access token and a new refresh token for `user`."""
+    jti = secrets.token_hex(16)
+    RefreshToken.objects.create(jti=jti, user=user)
+    # The signature includes the time it was made, checked on loading.
+    payload = {'u': user.pk, 'v': user.token_version}
+    return {
+        'access': signing.dumps(payload, salt=ACCESS_SALT),
+        'refresh': signing.dumps(dict(payload, j=jti), salt=REFRESH_SALT),
+        'expires_in': getattr(settings, 'ACCESS_TOKEN_TTL', 300),
+    }
+
+
+def use_refresh_token(payload):
+    """
+    Consume the refresh token of `payload`, so it can't be used again.
+
+    Of concurrent uses only one deletes the row, the others are refused.
+    """
+    deleted = RefreshToken.objects.filter(
+        jti=payload.get('j'), user_id=payload['u'],
+    ).delete()[0]
+    if not deleted:
+        raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+
+def load_signed_token(value, salt, max_age):
+    """Return the payload of a signed token, if valid and not expired."""
+    try:
+        return signing.loads(value, salt=salt, max_age=max_age)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed(_('Token has expired.'))
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+
+def check_token_user(user, payload):
+    """Check the user of a signed token may still use it."""
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    if user.token_version != payload['v']:
+        raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+
+def user_cache_key(user_id):
+    """Return the cache key of a user authenticated by signed tokens."""
+    return f'core.authentication.user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """
+    Return a user from the cache, loading it on a miss.
+
+    Only the fields checking signed tokens are cached, never the password
+    hash. The other fields are deferred, loaded when first accessed.
+    """
+    UserModel = get_user_model()
+    fields = [
+        field.attname for field in UserModel._meta.concrete_fields
+        if field.attname in CACHED_USER_FIELDS
+    ]
+    key = user_cache_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = UserModel.objects.filter(pk=user_id).values_list(
+            *fields,
+        ).first()
+        if values is None:
+            return None
+        ttl = getattr(settings, 'SIGNED_TOKEN_USER_CACHE_TTL', 60)
+        cache.set(key, values, ttl)
+    return UserModel.from_db(DEFAULT_DB_ALIAS, fields, values)
+
+
+def forget_cached_user(user_id):
+    """Drop a user from the cache, e.g. after its tokens were revoked."""
+    cache.delete(user_cache_key(user_id))
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authentication with short-lived signed access tokens.
+
+    Clients send `Authorization: Bearer <access token>`. The token is
+    checked by its HMAC signature and age alone. The user, and with it
+    the revocation counter, comes from the cache, so most requests need
+    no query at all.
+
+    The cached user may be `SIGNED_TOKEN_USER_CACHE_TTL` seconds old, so
+    only use this on views that don't save the user.
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        payload = load_signed_token(
+            key, ACCESS_SALT, getattr(settings, 'ACCESS_TOKEN_TTL', 300),
+        )
+        user = get_cached_user(payload['u'])
+        check_token_user(user, payload)
+        return (user, payload)
@@ -0,0 +1,48 @@
+"""
+Authentication backends.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import ValidationError
+from rest_framework.request import Request
+
+from core import passwords
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate with a case-insensitive email and a password.
+
+    Passwords are hashed with the limit of `core.passwords`, so a burst
+    of logins can't take all of a worker's CPU and threads.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(request, username, password, **kwargs)
+        except passwords.HasherBusy as exc:
+            if isinstance(request, Request):
+                raise  # A 503 with Retry-After from the API.
+            # Shown by login forms like the admin's instead of a 500.
+            raise ValidationError(str(exc.detail), code=exc.default_code)
+
+    def _authenticate(self, request, username, password, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so unknown emails take as long as known ones.
+            passwords.hash_password(password)
+            return None
+
+        valid, outdated = passwords.verify_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            user.password = passwords.hash_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,329 @@
+"""
+Django command to benchmark the API endpoints.
+"""
+import io
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.throttling import TokenBucketThrottle
+
+
+BENCH_EMAIL = 'benchmark-{}@example.com'
+BENCH_PASSWORD = 'benchmark-pass-123'
+
+SCENARIOS = [
+    'list', 'detail', 'create', 'update', 'filter', 'upload', 'token',
+]
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    """Return throughput and latency statistics for one scenario."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Return regressions of `results` against a baseline report."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        slower = previous['latency_ms']['p95'] * (1 + max_regression)
+        if current['latency_ms']['p95'] > slower:
+            regressions.append(
+                f"{name}: p95 {current['latency_ms']['p95']}ms, "
+                f"baseline {previous['latency_ms']['p95']}ms"
+            )
+        fewer = previous['throughput_rps'] * (1 - max_regression)
+        if current['throughput_rps'] < fewer:
+            regressions.append(
+                f"{name}: {current['throughput_rps']} req/s, "
+                f"baseline {previous['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API."""
+    help = (
+        'Seed a dataset and measure throughput and latency of the API '
+        'endpoints, optionally gating on a stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument(
+            '--recipes', type=int, default=200, help='Recipes per user.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests per scenario.',
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--scenarios',
+            default=','.join(SCENARIOS),
+            help=f'Comma separated list out of {", ".join(SCENARIOS)}.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output', help='Write the JSON report to this file.',
+        )
+        parser.add_argument(
+            '--baseline', help='Compare against this JSON report.',
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=10.0,
+            help='Allowed p95 latency/throughput regression in percent.',
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help="Don't delete the seeded dataset afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        scenarios = [s for s in options['scenarios'].split(',') if s]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}')
+
+        self.rng = random.Random(options['seed'])
+        self.image = self._make_image()
+        users = self._seed(options['users'], options['recipes'])
+        # Don't let throttling reject the benchmark's own traffic.
+        unthrottled = {
+            scope: '1000000/s'
+            for scope in TokenBucketThrottle.THROTTLE_RATES
+        }
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(
+                        MEDIA_ROOT=media_root,
+                        ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver'],
+                    ), \
+                    patch.object(
+                        TokenBucketThrottle, 'THROTTLE_RATES', unthrottled,
+                    ):
+                results = {
+                    'config': {
+                        key: options[key] for key in [
+                            'users', 'recipes', 'requests', 'concurrency',
+                            'seed',
+                        ]
+                    },
+                    'scenarios': {
+                        name: self._run(
+                            name,
+                            users,
+                            options['requests'],
+                            options['concurrency'],
+                        )
+                        for name in scenarios
+                    },
+                }
+        finally:
+            if not options['keep_data']:
+                get_user_model().objects.filter(
+                    pk__in=[user.pk for user, _ in users],
+                ).delete()
+
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report + '\n')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare(
+                results, baseline, options['max_regression'] / 100,
+            )
+            if regressions:
+                raise CommandError(
+                    'Performance regressed:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def _make_image(self):
+        """Return the bytes of a small JPEG for the upload scenario."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def _seed(self, user_count, recipe_count):
+        """Create users with tags, ingredients and recipes."""
+        # Hash the shared password once instead of once per user.
+        password = make_password(BENCH_PASSWORD)
+        users = []
+        for i in range(user_count):
+            user, _ = get_user_model().objects.update_or_create(
+                email=BENCH_EMAIL.format(i),
+                defaults={'password': password, 'name': f'Benchmark {i}'},
+            )
+            tags = self._names(Tag, user, 'Tag', 20)
+            ingredients = self._names(Ingredient, user, 'Ingredient', 50)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    user=user,
+                    title=f'Recipe {n}',
+                    time_minutes=self.rng.randint(5, 180),
+                    price=Decimal(self.rng.randint(100, 5000)) / 100,
+                    description='Benchmark recipe.',
+                )
+                for n in range(recipe_count)
+            )
+            for recipe in recipes:
+                recipe.tags.add(*self.rng.sample(tags, 3))
+                recipe.ingredients.add(*self.rng.sample(ingredients, 8))
+            token, _ = Token.objects.get_or_create(user=user)
+            users.append((user, {
+                'token': token.key,
+                'recipe_ids': [recipe.id for recipe in recipes],
+                'tag_ids': [tag.id for tag in tags],
+            }))
+        return users
+
+    def _names(self, model, user, prefix, count):
+        """Return the user's `count` tags or ingredients, creating them."""
+        names = [f'{prefix} {n}' for n in range(count)]
+        # They already exist when rerunning with --keep-data, and names are
+        # unique per user.
+        model.objects.bulk_create(
+            (model(user=user, name=name) for name in names),
+            ignore_conflicts=True,
+        )
+        return list(
+            model.objects.filter(user=user, name__in=names).order_by('id')
+        )
+
+    def _request(self, name, client, user, data):
+        """Send one request of a scenario and return the response."""
+        recipe_url = None
+        if data['recipe_ids']:
+            recipe_id = self.rng.choice(data['recipe_ids'])
+            recipe_url = reverse('recipe:recipe-detail', args=[recipe_id])
+        if name == 'list':
+            return client.get(reverse('recipe:recipe-list'))
+        if name == 'detail':
+            return client.get(recipe_url)
+        if name == 'create':
+            return client.post(reverse('recipe:recipe-list'), {
+                'title': 'Benchmark recipe',
+                'time_minutes': 30,
+                'price': '9.99',
+                'tags': [{'name': 'Tag 1'}, {'name': 'New tag'}],
+                'ingredients': [{'name': 'Ingredient 1'}],
+            }, format='json')
+        if name == 'update':
+            return client.patch(recipe_url, {
+                'title': 'Updated recipe',
+                'tags': [{'name': 'Tag 2'}],
+            }, format='json')
+        if name == 'filter':
+            tag_ids = self.rng.sample(data['tag_ids'], 2)
+            return client.get(
+                reverse('recipe:recipe-list'),
+                {'tags': ','.join(str(tag_id) for tag_id in tag_ids)},
+            )
+        if name == 'upload':
+            image = io.BytesIO(self.image)
+            image.name = 'benchmark.jpg'
+            return client.post(
+                reverse('recipe:recipe-upload-image', args=[recipe_id]),
+                {'image': image},
+                format='multipart',
+            )
+        return client.post(reverse('user:token'), {
+            'email': user.email,
+            'password': BENCH_PASSWORD,
+        })
+
+    def _worker(self, name, users, count, latencies, errors, lock):
+        """Send `count` requests, recording their latency."""
+        try:
+            for i in range(count):
+                user, data = users[i % len(users)]
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+                start = time.perf_counter()
+                response = self._request(name, client, user, data)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code >= 400:
+                        errors[0] += 1
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    def _run(self, name, users, requests, concurrency):
+        """Run one scenario and return its statistics."""
+        self.stderr.write(f'Running {name}...')
+        latencies, errors, lock = [], [0], threading.Lock()
+        start = time.perf_counter()
+        if concurrency == 1:
+            self._worker(name, users, requests, latencies, errors, lock)
+        else:
+            shares = [
+                requests // concurrency + (i < requests % concurrency)
+                for i in range(concurrency)
+            ]
+            threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(name, users, share, latencies, errors, lock),
+                )
+                for share in shares
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return summarize(latencies, errors[0], time.perf_counter() - start)
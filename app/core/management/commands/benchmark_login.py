@@ -0,0 +1,158 @@
+"""
+Django command to benchmark logins under concurrency.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import passwords
+from core.management.commands.benchmark_api import summarize
+from core.throttling import TokenBucketThrottle
+
+
+LOGIN_EMAIL = 'login-benchmark-{}@example.com'
+LOGIN_PASSWORD = 'login-benchmark-pass-123'
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the token endpoint."""
+    help = (
+        'Send concurrent login requests to the token endpoint and report '
+        'throughput, latency and how many were shed with 503.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--failed', type=float, default=0.2,
+            help='Share of logins with a wrong password or unknown email.',
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Concurrent hashes, defaults to PASSWORD_HASH_WORKERS.',
+        )
+        parser.add_argument(
+            '--queue', type=int,
+            help='Queued logins, defaults to PASSWORD_HASH_QUEUE.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output', help='Write the JSON report to this file.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.rng = random.Random(options['seed'])
+        limiter = passwords.get_limiter()
+        limiter = passwords.HashLimiter(
+            options['workers'] or limiter.max_workers,
+            limiter.max_queue if options['queue'] is None
+            else options['queue'],
+        )
+        # Hash once, the benchmark is about the logins.
+        password = make_password(LOGIN_PASSWORD)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=LOGIN_EMAIL.format(i), password=password)
+            for i in range(options['users'])
+        )
+        logins = [
+            self._credentials(options['users'], options['failed'])
+            for _ in range(options['requests'])
+        ]
+        unthrottled = {
+            scope: '1000000/s'
+            for scope in TokenBucketThrottle.THROTTLE_RATES
+        }
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver'],
+            ), patch.object(
+                TokenBucketThrottle, 'THROTTLE_RATES', unthrottled,
+            ), patch.object(passwords, '_limiter', limiter):
+                results = self._run(logins, options['concurrency'])
+        finally:
+            get_user_model().objects.filter(
+                pk__in=[user.pk for user in users],
+            ).delete()
+
+        results['config'] = {
+            'users': options['users'],
+            'concurrency': options['concurrency'],
+            'failed': options['failed'],
+            'workers': limiter.max_workers,
+            'queue': limiter.max_queue,
+        }
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report + '\n')
+
+    def _credentials(self, users, failed):
+        """Return the payload of one login, failing or not."""
+        email = LOGIN_EMAIL.format(self.rng.randrange(users))
+        if self.rng.random() >= failed:
+            return {'email': email, 'password': LOGIN_PASSWORD}
+        if self.rng.random() < 0.5:
+            return {'email': email, 'password': 'wrong-password'}
+        return {'email': 'unknown@example.com', 'password': LOGIN_PASSWORD}
+
+    def _worker(self, logins, latencies, statuses, lock):
+        """Send the logins, recording latency and status codes."""
+        client = APIClient()
+        try:
+            for payload in logins:
+                start = time.perf_counter()
+                response = client.post(reverse('user:token'), payload)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status_code] += 1
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    def _run(self, logins, concurrency):
+        """Send all logins from `concurrency` threads."""
+        latencies, statuses, lock = [], Counter(), threading.Lock()
+        start = time.perf_counter()
+        if concurrency == 1:
+            self._worker(logins, latencies, statuses, lock)
+        else:
+            self._run_threads(logins, concurrency, latencies, statuses, lock)
+        elapsed = time.perf_counter() - start
+
+        errors = sum(n for code, n in statuses.items() if code >= 500)
+        results = summarize(latencies, errors, elapsed)
+        results['statuses'] = {
+            str(code): n for code, n in sorted(statuses.items())
+        }
+        return results
+
+    def _run_threads(self, logins, concurrency, latencies, statuses, lock):
+        """Split the logins between `concurrency` threads."""
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(logins[i::concurrency], latencies, statuses, lock),
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
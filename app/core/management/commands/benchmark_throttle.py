@@ -0,0 +1,66 @@
+"""
+Django command to measure the latency throttling adds to a request.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework import throttling
+
+from core.throttling import TokenBucketThrottle
+
+
+class BucketThrottle(TokenBucketThrottle):
+    """Token bucket throttle with a rate that never throttles."""
+    rate = '1000000/s'
+
+    def get_cache_key(self, request, view):
+        return 'throttle:benchmark:1'
+
+
+class CacheThrottle(throttling.SimpleRateThrottle):
+    """DRF's stock cache backed throttle, for comparison."""
+    rate = '1000000/s'
+
+    def get_cache_key(self, request, view):
+        return 'throttle:benchmark:1'
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the throttles."""
+    help = 'Measure the per request latency added by the throttles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=10000,
+            help='Number of simulated requests per throttle.',
+        )
+
+    def _measure(self, throttle_class, request, count):
+        """Return the time in microseconds each request spent throttling."""
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            # DRF instantiates the throttles for every request.
+            throttle_class().allow_request(request, None)
+            timings.append((time.perf_counter() - start) * 1e6)
+        return timings
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        count = options['requests']
+        request = RequestFactory().get('/api/recipe/recipes/')
+        for name, throttle_class in [
+            ('token bucket (shared mmap store)', BucketThrottle),
+            ('DRF SimpleRateThrottle (cache)', CacheThrottle),
+        ]:
+            timings = sorted(self._measure(throttle_class, request, count))
+            self.stdout.write(
+                f'{name}: mean {statistics.mean(timings):.1f}us, '
+                f'p50 {timings[len(timings) // 2]:.1f}us, '
+                f'p99 {timings[int(len(timings) * 0.99)]:.1f}us '
+                f'over {count} requests'
+            )
@@ -0,0 +1,108 @@
+"""
+Django command to apply migrations only when some are pending.
+"""
+import pkgutil
+import zlib
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+
+# Key of the PostgreSQL advisory lock serializing migrations.
+MIGRATE_LOCK_ID = zlib.crc32(b'recipe-api:migrate')
+
+
+def disk_migrations():
+    """
+    Return the `(app_label, name)` of every migration file on disk.
+
+    Only file names are listed, the migration modules aren't imported,
+    which is what makes this much cheaper than building the graph.
+    """
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = find_spec(module_name)
+        except ModuleNotFoundError:
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        # The same filter Django's MigrationLoader applies.
+        found.update(
+            (app_config.label, name)
+            for _, name, is_pkg in pkgutil.iter_modules(
+                spec.submodule_search_locations,
+            )
+            if not is_pkg and name[0] not in '_~'
+        )
+    return found
+
+
+def applied_migrations(connection):
+    """Return the applied migrations, in a single query."""
+    table = MigrationRecorder.Migration._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT app, name FROM {connection.ops.quote_name(table)}'
+            )
+            return set(cursor.fetchall())
+    except DatabaseError:
+        # The table doesn't exist before the first migration.
+        return set()
+
+
+class Command(BaseCommand):
+    """Django command to migrate only if migrations are pending."""
+    help = (
+        'Compare the migration files on disk with the applied migrations '
+        'and run migrate only if some are pending, one process at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        connection = connections[options['database']]
+        expected = disk_migrations()
+        if expected <= applied_migrations(connection):
+            self.stdout.write('No migrations to apply.')
+            return
+
+        if connection.vendor != 'postgresql':
+            self._migrate(options['database'])
+            return
+
+        # Other replicas may be starting too, only one of them migrates.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [MIGRATE_LOCK_ID])
+            try:
+                if expected <= applied_migrations(connection):
+                    self.stdout.write(
+                        'Migrations were applied by another process.'
+                    )
+                else:
+                    self._migrate(options['database'])
+            finally:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s)', [MIGRATE_LOCK_ID],
+                )
+
+    def _migrate(self, database):
+        self.stdout.write('Applying pending migrations...')
+        call_command(
+            'migrate',
+            database=database,
+            interactive=False,
+            stdout=self.stdout,
+            stderr=self.stderr,
+        )
@@ -0,0 +1,146 @@
+"""
+Django command to profile the cold start of a worker.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter: load the WSGI application like a worker
+# does, then serve one request.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from django.conf import settings
+from django.utils.module_loading import import_string
+application = import_string(settings.WSGI_APPLICATION)
+loaded = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': sys.argv[2]}
+setup_testing_defaults(environ)
+status = []
+b''.join(application(environ, lambda s, h, e=None: status.append(s)))
+done = time.perf_counter()
+print(json.dumps({
+    'status': status[0],
+    'load_seconds': loaded - start,
+    'first_request_seconds': done - loaded,
+}))
+'''
+
+
+def parse_importtime(output):
+    """Return `(name, self_us, cumulative_us)` from -X importtime output."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # The header line.
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+class Command(BaseCommand):
+    """Django command to profile worker startup."""
+    help = (
+        'Start fresh interpreters that load the WSGI application and serve '
+        'one request, reporting import times and time to first request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/api/recipe/recipe/',
+            help='Path of the first request.',
+        )
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Number of modules and packages to list.',
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Print a JSON report.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+        runs = []
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [
+                    sys.executable, '-X', 'importtime', '-c', PROBE,
+                    options['path'], options['host'],
+                ],
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=os.getcwd(),
+            )
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                raise CommandError(f'Startup failed:\n{result.stderr}')
+            run = json.loads(result.stdout.splitlines()[-1])
+            run['process_seconds'] = elapsed
+            run['imports'] = parse_importtime(result.stderr)
+            runs.append(run)
+
+        report = self._report(runs, options['top'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"First request: {report['status']} after "
+            f"{report['process_ms']:.0f} ms (median of {len(runs)} runs)"
+        )
+        self.stdout.write(f"  load application: {report['load_ms']:.0f} ms")
+        self.stdout.write(
+            f"  first request:    {report['first_request_ms']:.0f} ms"
+        )
+        self.stdout.write(
+            f"  imports:          {report['import_ms']:.0f} ms "
+            f"in {report['modules']} modules"
+        )
+        self.stdout.write('\nSlowest packages (own import time):')
+        for name, ms in report['packages']:
+            self.stdout.write(f'  {ms:8.1f} ms  {name}')
+        self.stdout.write('\nSlowest modules (including their imports):')
+        for name, ms in report['cumulative']:
+            self.stdout.write(f'  {ms:8.1f} ms  {name}')
+
+    def _report(self, runs, top):
+        """Summarize the runs, imports come from the last one."""
+        def median_ms(key):
+            return statistics.median(run[key] for run in runs) * 1000
+
+        imports = runs[-1]['imports']
+        packages = Counter()
+        for name, self_us, _ in imports:
+            packages[name.split('.')[0]] += self_us
+        cumulative = sorted(imports, key=lambda i: i[2], reverse=True)
+        return {
+            'status': runs[-1]['status'],
+            'process_ms': median_ms('process_seconds'),
+            'load_ms': median_ms('load_seconds'),
+            'first_request_ms': median_ms('first_request_seconds'),
+            'import_ms': sum(i[1] for i in imports) / 1000,
+            'modules': len(imports),
+            'packages': [
+                (name, us / 1000) for name, us in packages.most_common(top)
+            ],
+            'cumulative': [
+                (name, us / 1000) for name, _, us in cumulative[:top]
+            ],
+        }
@@ -0,0 +1,65 @@
+"""
+Django command to delete expired auth tokens.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.authentication import expired_filter
+from core.models import RefreshToken, TokenActivity
+
+
+class Command(BaseCommand):
+    """Django command to purge expired tokens."""
+    help = (
+        'Delete expired auth tokens and refresh tokens in small batches, '
+        'each in its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        # A fixed cutoff, so tokens expiring meanwhile can't keep it going.
+        now = timezone.now()
+        purged = self._purge(
+            Token.objects.filter(expired_filter(now)), options,
+        )
+        refresh_cutoff = now - timedelta(seconds=settings.REFRESH_TOKEN_TTL)
+        purged_refresh = self._purge(
+            RefreshToken.objects.filter(created__lt=refresh_cutoff), options,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} expired tokens and {purged_refresh} '
+            'expired refresh tokens.'
+        ))
+
+    def _purge(self, expired, options):
+        """Delete the rows of `expired` in batches, returning how many."""
+        model = expired.model
+        batch_size = options['batch_size']
+        purged = 0
+        while True:
+            keys = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                break
+            with transaction.atomic():
+                if model is Token:
+                    TokenActivity.objects.filter(token__in=keys).delete()
+                model.objects.filter(pk__in=keys).delete()
+            purged += len(keys)
+            if len(keys) < batch_size:
+                break
+            time.sleep(options['sleep'])
+        return purged
@@ -0,0 +1,47 @@
+"""
+Django command to recompute the per-user recipe summaries.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from core import summaries
+
+
+class Command(BaseCommand):
+    """Django command to backfill and repair recipe summaries."""
+    help = (
+        'Recompute RecipeSummary rows from the recipes, writing only the '
+        'ones that are missing or wrong.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Only rebuild the summary of this user ID, repeatable.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Users per statement and transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = get_user_model().objects.all()
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        bounds = users.aggregate(first=Min('pk'), last=Max('pk'))
+        repaired = 0
+        if bounds['first'] is not None:
+            batch_size = options['batch_size']
+            for first in range(bounds['first'], bounds['last'] + 1,
+                               batch_size):
+                with transaction.atomic():
+                    repaired += summaries.rebuild(
+                        first, first + batch_size - 1, options['users'],
+                    )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {repaired} recipe summaries.'
+        ))
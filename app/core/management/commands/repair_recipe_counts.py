@@ -0,0 +1,43 @@
+"""
+Django command to recompute the recipe counts of tags and ingredients.
+"""
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+
+from core.signals import COUNTED_RELATIONS
+
+
+REPAIR_SQL = '''
+UPDATE {target} AS t
+SET recipe_count = COALESCE(c.n, 0)
+FROM {target} AS t2
+LEFT JOIN (
+    SELECT {column}, COUNT(*) AS n
+    FROM {through}
+    GROUP BY {column}
+) AS c ON c.{column} = t2.id
+WHERE t.id = t2.id AND t.recipe_count <> COALESCE(c.n, 0)
+'''
+
+
+class Command(BaseCommand):
+    """Django command to repair denormalized recipe counts."""
+    help = 'Recompute Tag.recipe_count and Ingredient.recipe_count in bulk.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for through, (target, column) in COUNTED_RELATIONS.items():
+            sql = REPAIR_SQL.format(
+                target=target._meta.db_table,
+                through=through._meta.db_table,
+                column=column,
+            )
+            # One set-based statement per table, only touching drifted rows.
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql)
+                fixed = cursor.rowcount
+            self.stdout.write(
+                f'{target.__name__}: repaired {fixed} recipe counts.'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Recipe counts repaired!'))
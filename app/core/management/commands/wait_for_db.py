@@ -1,27 +1,93 @@
 """
 Django command to wait for the database to be available.
 """
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to wait for the database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for, can be repeated.',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60.0,
+            help='Give up after this many seconds, 0 waits forever.',
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.05,
+            help='Seconds to wait after the first failed attempt.',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=2.0,
+            help='Upper bound of the wait between two attempts.',
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
+        aliases = options['databases'] or ['default']
+        unknown = [alias for alias in aliases if alias not in connections]
+        if unknown:
+            raise CommandError(f'Unknown databases: {", ".join(unknown)}')
+
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
+        deadline = None
+        if options['timeout']:
+            deadline = time.monotonic() + options['timeout']
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            futures = [
+                executor.submit(self.wait, alias, deadline, options)
+                for alias in aliases
+            ]
+            for future in futures:
+                future.result()
+
+        self.stdout.write(self.style.SUCCESS('Database available!'))
+
+    def probe(self, alias):
+        """Open a connection to the database, raising if it's down."""
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+        finally:
+            # Connections are per thread, don't leave this one behind.
+            connection.close()
+
+    def wait(self, alias, deadline, options):
+        """Probe one database with exponential backoff until it's up."""
+        delay = options['initial_delay']
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe(alias)
+                return
             except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                pass
 
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+            # Jitter keeps many containers from retrying in lockstep.
+            wait = random.uniform(delay / 2, delay)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database "{alias}" unavailable after '
+                        f'{options["timeout"]:g} seconds.'
+                    )
+                wait = min(wait, remaining)
+            self.stdout.write(
+                f'Database "{alias}" unavailable, '
+                f'waiting {wait:.2f} seconds...'
+            )
+            time.sleep(wait)
+            delay = min(delay * 2, options['max_delay'])
@@ -0,0 +1,317 @@
+"""
+Lightweight metrics registry with Prometheus text exposition.
+
+Each process records into its own registry. When `METRICS_DIR` is set,
+processes periodically write their samples to a file in that directory
+and a scrape sums the files of every process, so counters and histograms
+aggregate across workers. The samples of exited workers are merged into
+an aggregate file, so totals don't go backwards when a worker is recycled
+and the directory doesn't grow with every worker that ever ran. Processes
+are told apart by PID, so the directory must not be shared by processes
+of different hosts or containers.
+"""
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+# File in `METRICS_DIR` holding the samples of processes that exited.
+AGGREGATE_FILE = 'metrics-aggregate.json'
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _label_key(labels):
+    """Return a hashable, ordered key for a dict of labels."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects it."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    """Escape a label value."""
+    return (
+        value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    )
+
+
+def _read(path):
+    """Return the samples in a metrics file, or None if it can't be read."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        # The file vanished or is being replaced.
+        return None
+    return {
+        (sample_name, tuple(tuple(label) for label in labels)): value
+        for sample_name, labels, value in data
+    }
+
+
+def _write(path, samples):
+    """Atomically write `samples` to `path` as JSON."""
+    data = [
+        [sample_name, list(labels), value]
+        for (sample_name, labels), value in samples.items()
+    ]
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _add(total, samples):
+    """Add `samples` to `total` in place."""
+    for key, value in samples.items():
+        total[key] = total.get(key, 0.0) + value
+
+
+def _format_labels(labels):
+    """Format a label key as `{name="value",...}`."""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, _escape(value)) for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Registry:
+    """Hold metric definitions and the values of their samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._samples = {}
+
+    def register(self, metric):
+        """Register a metric, returning the existing one on name clashes."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def add(self, sample_name, labels, amount):
+        """Add `amount` to a single sample."""
+        key = (sample_name, labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+    def samples(self):
+        """Return a copy of every sample recorded so far."""
+        with self._lock:
+            return dict(self._samples)
+
+    def clear(self):
+        """Reset every sample, keeping the metric definitions."""
+        with self._lock:
+            self._samples.clear()
+
+    def reset_after_fork(self):
+        """Drop the samples a forked child inherited from its parent."""
+        # The lock may have been held by a thread that wasn't forked.
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def write(self, path):
+        """Atomically write the samples to `path` as JSON."""
+        _write(path, self.samples())
+
+    def value(self, sample_name, **labels):
+        """Return the current value of a single sample."""
+        return self.samples().get((sample_name, _label_key(labels)), 0.0)
+
+    def render(self, samples=None):
+        """Render samples in the Prometheus text exposition format."""
+        if samples is None:
+            samples = self.samples()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for (sample_name, labels), value in samples.items():
+                if sample_name not in metric.sample_names:
+                    continue
+                lines.append(
+                    f'{sample_name}{_format_labels(labels)} '
+                    f'{_format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """Base class for metrics."""
+    type = 'untyped'
+
+    def __init__(self, name, documentation, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry
+        registry.register(self)
+
+    @property
+    def sample_names(self):
+        return (self.name,)
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter by `amount`."""
+        self.registry.add(self.name, _label_key(labels), amount)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS,
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super().__init__(name, documentation, registry=registry)
+
+    @property
+    def sample_names(self):
+        return (
+            f'{self.name}_bucket', f'{self.name}_sum', f'{self.name}_count',
+        )
+
+    def observe(self, value, **labels):
+        """Record a single observation."""
+        for bound in self.buckets:
+            bucket_labels = dict(labels, le=_format_value(bound))
+            self.registry.add(
+                f'{self.name}_bucket',
+                _label_key(bucket_labels),
+                1 if value <= bound else 0,
+            )
+        key = _label_key(labels)
+        self.registry.add(f'{self.name}_sum', key, value)
+        self.registry.add(f'{self.name}_count', key, 1)
+
+
+_last_flush = 0.0
+
+
+def _process_file(directory, pid=None):
+    return os.path.join(directory, f'metrics-{pid or os.getpid()}.json')
+
+
+def _file_pid(path):
+    """Return the PID a process file belongs to, None for other files."""
+    name = os.path.basename(path)[len('metrics-'):-len('.json')]
+    return int(name) if name.isdigit() else None
+
+
+def _exited(pid):
+    """Return True if no process with `pid` is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Running as another user.
+    return False
+
+
+def merge_files(directory, pids):
+    """
+    Move the samples of processes that exited into the aggregate file.
+
+    Only files of `pids` whose process isn't running are merged, checked
+    under a lock so two scrapes don't merge the same file twice.
+    """
+    with open(os.path.join(directory, 'metrics.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        total = _read(aggregate_path) or {}
+        merged = []
+        for pid in pids:
+            path = _process_file(directory, pid)
+            if pid != os.getpid() and not _exited(pid):
+                continue
+            samples = _read(path)
+            if samples is None:
+                continue  # Merged by another process meanwhile.
+            _add(total, samples)
+            merged.append(path)
+        if merged:
+            _write(aggregate_path, total)
+            for path in merged:
+                os.remove(path)
+
+
+def start_process():
+    """Merge the file an earlier process with this PID left behind."""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory and os.path.exists(_process_file(directory)):
+        merge_files(directory, [os.getpid()])
+
+
+def _after_fork():
+    REGISTRY.reset_after_fork()
+    start_process()
+
+
+# A child forked by a pre-fork server starts counting from zero, its
+# parent's samples are the parent's to report.
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def flush(force=False):
+    """Share this process's samples, at most once per flush interval."""
+    global _last_flush
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return
+    now = time.monotonic()
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+    if not force and now - _last_flush < interval:
+        return
+    _last_flush = now
+    REGISTRY.write(_process_file(directory))
+
+
+def collect():
+    """Return the samples of every process, summed."""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return REGISTRY.samples()
+    flush(force=True)
+    paths = sorted(glob.glob(os.path.join(directory, 'metrics-*.json')))
+    pids = [_file_pid(path) for path in paths]
+    exited = [pid for pid in pids if pid is not None and _exited(pid)]
+    if exited:
+        merge_files(directory, exited)
+        paths = sorted(
+            glob.glob(os.path.join(directory, 'metrics-*.json')),
+        )
+    samples = {}
+    for path in paths:
+        data = _read(path)
+        if data is not None:
+            _add(samples, data)
+    return samples
+
+
+def render():
+    """Render the metrics of every process in the text format."""
+    return REGISTRY.render(collect())
@@ -0,0 +1,298 @@
+"""
+Custom middleware for the API.
+"""
+import time
+import zlib
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available.
+    brotli = None
+
+
+COMPRESSION_BYTES_IN = metrics.Counter(
+    'http_compression_bytes_in_total',
+    'Response bytes before compression.',
+)
+COMPRESSION_BYTES_OUT = metrics.Counter(
+    'http_compression_bytes_out_total',
+    'Response bytes after compression.',
+)
+COMPRESSION_CPU_SECONDS = metrics.Counter(
+    'http_compression_cpu_seconds_total',
+    'CPU time spent compressing responses.',
+)
+COMPRESSION_RATIO = metrics.Histogram(
+    'http_compression_ratio',
+    'Compressed size divided by original size.',
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0),
+)
+
+REQUEST_LATENCY = metrics.Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling requests.',
+)
+REQUESTS = metrics.Counter(
+    'http_requests_total',
+    'Requests handled, by status code.',
+)
+REQUEST_QUERIES = metrics.Histogram(
+    'http_request_db_queries',
+    'SQL queries executed per request.',
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+REQUEST_QUERY_SECONDS = metrics.Histogram(
+    'http_request_db_seconds',
+    'Time spent in SQL queries per request.',
+)
+RESPONSE_SIZE = metrics.Histogram(
+    'http_response_size_bytes',
+    'Size of response bodies, after compression.',
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000),
+)
+
+# `view.action` label of the request being handled, for code that runs
+# outside the view such as database execute wrappers.
+current_view = ContextVar('current_view', default=None)
+
+# Content types that are already compressed and would only waste CPU.
+INCOMPRESSIBLE_TYPES = (
+    'image/',
+    'video/',
+    'audio/',
+    'font/woff',
+    'application/zip',
+    'application/gzip',
+    'application/x-gzip',
+    'application/pdf',
+    'application/octet-stream',
+)
+
+
+def _accepted_encodings(header):
+    """Parse an Accept-Encoding header into a `{coding: q}` dict."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """Return the best encoding accepted by the client, or None."""
+    accepted = _accepted_encodings(header)
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _Compressor:
+    """Incremental compressor that records its CPU time and sizes."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(
+                quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5),
+            )
+        else:
+            # wbits=16+MAX_WBITS produces a gzip container.
+            self._compressor = zlib.compressobj(
+                getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6),
+                zlib.DEFLATED,
+                16 + zlib.MAX_WBITS,
+            )
+
+    def _run(self, func, *args):
+        start = time.thread_time()
+        data = func(*args)
+        self.cpu_time += time.thread_time() - start
+        self.bytes_out += len(data)
+        return data
+
+    def compress(self, data):
+        """Compress a chunk and flush it so it can be sent right away."""
+        self.bytes_in += len(data)
+        if self.encoding == 'br':
+            return self._run(self._compressor.process, data) + \
+                self._run(self._compressor.flush)
+        return self._run(self._compressor.compress, data) + \
+            self._run(self._compressor.flush, zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """Finish the stream and return the trailing bytes."""
+        if self.encoding == 'br':
+            return self._run(self._compressor.finish)
+        return self._run(self._compressor.flush, zlib.Z_FINISH)
+
+    def record(self):
+        """Publish the sizes and CPU time of this response as metrics."""
+        COMPRESSION_BYTES_IN.inc(self.bytes_in, encoding=self.encoding)
+        COMPRESSION_BYTES_OUT.inc(self.bytes_out, encoding=self.encoding)
+        COMPRESSION_CPU_SECONDS.inc(self.cpu_time, encoding=self.encoding)
+        if self.bytes_in:
+            COMPRESSION_RATIO.observe(
+                self.bytes_out / self.bytes_in, encoding=self.encoding,
+            )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli or gzip, depending on the client.
+
+    Short responses and media that is already compressed are sent as is.
+    Streaming responses are compressed chunk by chunk, so they keep
+    streaming.
+    """
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 512)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        # Avoid compressing twice or touching encoded content.
+        if response.has_header('Content-Encoding'):
+            return response
+
+        content_type = response.get('Content-Type', '').lower()
+        if content_type.startswith(INCOMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(encoding)
+        if response.streaming:
+            response.streaming_content = self._compress_stream(
+                compressor, response.streaming_content,
+            )
+            # The compressed size is unknown until the stream ends.
+            del response['Content-Length']
+        else:
+            compressed = compressor.compress(response.content) + \
+                compressor.finish()
+            compressor.record()
+            # Return the compressed content only if it's actually shorter.
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Compression changes the bytes, so a strong ETag must become weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    @staticmethod
+    def _compress_stream(compressor, chunks):
+        """Compress an iterable of chunks lazily."""
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        compressor.record()
+
+
+def view_labels(request, view_func):
+    """Return the `view` and `action` labels for a resolved view."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        name = getattr(view_func, '__name__', type(view_func).__name__)
+        return f'{view_func.__module__}.{name}', ''
+    # ViewSets map HTTP methods to actions, plain API views don't.
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return cls.__name__, action
+
+
+class _QueryTimer:
+    """Database execute wrapper counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL usage, response size and status per view.
+
+    The view and action labels come from the resolved view, so they stay
+    bounded no matter which URLs clients request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_labels = ('unresolved', '')
+        timer = _QueryTimer()
+        token = current_view.set(None)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            current_view.reset(token)
+        duration = time.perf_counter() - start
+
+        view, action = request.metrics_labels
+        labels = {'view': view, 'action': action}
+        REQUEST_LATENCY.observe(duration, **labels)
+        REQUESTS.inc(status=response.status_code, **labels)
+        REQUEST_QUERIES.observe(timer.count, **labels)
+        REQUEST_QUERY_SECONDS.observe(timer.seconds, **labels)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), **labels)
+        metrics.flush()
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_labels = view_labels(request, view_func)
+        current_view.set('.'.join(filter(None, request.metrics_labels)))
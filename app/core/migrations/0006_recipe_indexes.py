@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], include=('id',), name='ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], include=('id',), name='tag_user_name_idx'),
+        ),
+        # The auto-created through tables only index (recipe_id, x_id) and
+        # x_id on its own; filtering recipes by tag or ingredient walks them
+        # in reverse, so give that direction a composite index too.
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX core_recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql=(
+                'DROP INDEX core_recipe_ingredients_ingredient_recipe_idx;'
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:07
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = '''
+UPDATE core_{target} AS t
+SET recipe_count = c.n
+FROM (
+    SELECT {target}_id, COUNT(*) AS n
+    FROM core_recipe_{table}
+    GROUP BY {target}_id
+) AS c
+WHERE c.{target}_id = t.id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(condition=models.Q(('recipe_count__gt', 0)), fields=['user', 'name'], name='ingredient_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', '-name'], name='ingredient_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(condition=models.Q(('recipe_count__gt', 0)), fields=['user', 'name'], name='tag_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', '-name'], name='tag_popular_idx'),
+        ),
+        migrations.RunSQL(
+            BACKFILL_SQL.format(target='tag', table='tags'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            BACKFILL_SQL.format(target='ingredient', table='ingredients'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
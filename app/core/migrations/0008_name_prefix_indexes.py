@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_count'),
+    ]
+
+    # Prefix (LIKE 'abc%') lookups on the normalized name for autocomplete.
+    # Expression indexes with an operator class can't be declared on the
+    # model in Django 3.2, so they are created with raw SQL.
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX tag_name_prefix_idx ON core_tag '
+            '(user_id, LOWER(TRIM(name)) text_pattern_ops);',
+            reverse_sql='DROP INDEX tag_name_prefix_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX ingredient_name_prefix_idx ON core_ingredient '
+            '(user_id, LOWER(TRIM(name)) text_pattern_ops);',
+            reverse_sql='DROP INDEX ingredient_name_prefix_idx;',
+        ),
+    ]
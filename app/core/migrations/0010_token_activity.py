@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0009_user_email_upper_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenActivity',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity', serialize=False, to='authtoken.token')),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        # purge_tokens finds expired tokens by their creation time, which
+        # authtoken doesn't index.
+        migrations.RunSQL(
+            'CREATE INDEX authtoken_token_created_idx '
+            'ON authtoken_token (created);',
+            reverse_sql='DROP INDEX authtoken_token_created_idx;',
+        ),
+    ]
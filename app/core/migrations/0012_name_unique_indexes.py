@@ -0,0 +1,95 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:50
+
+from django.db import migrations
+
+
+# Keep the oldest row of each user and normalized name, link its recipes
+# to it and delete the others.
+DEDUPE_SQL = '''
+WITH dupes AS (
+    SELECT id, keep
+    FROM (
+        SELECT id, MIN(id) OVER (
+            PARTITION BY user_id, LOWER(TRIM(name))
+        ) AS keep
+        FROM core_{target}
+    ) AS d
+    WHERE id <> keep
+),
+moved AS (
+    DELETE FROM core_recipe_{table} AS l
+    USING dupes
+    WHERE l.{target}_id = dupes.id
+    RETURNING l.recipe_id, dupes.keep
+),
+added AS (
+    INSERT INTO core_recipe_{table} (recipe_id, {target}_id)
+    SELECT DISTINCT recipe_id, keep FROM moved
+    ON CONFLICT (recipe_id, {target}_id) DO NOTHING
+)
+DELETE FROM core_{target} AS t
+USING dupes
+WHERE t.id = dupes.id
+'''
+
+# Only the kept rows gain links, so only their counts need an update.
+RECOUNT_SQL = '''
+UPDATE core_{target} AS t
+SET recipe_count = c.n
+FROM (
+    SELECT {target}_id, COUNT(*) AS n
+    FROM core_recipe_{table}
+    GROUP BY {target}_id
+) AS c
+WHERE c.{target}_id = t.id AND t.recipe_count <> c.n
+'''
+
+# Expression indexes can't be declared on the model in Django 3.2. The
+# expression must match the one used by `ON CONFLICT` in recipe.names.
+# With text_pattern_ops it also serves the autocomplete prefix lookups,
+# so it replaces the prefix index.
+UNIQUE_SQL = '''
+CREATE UNIQUE INDEX {target}_user_name_uniq ON core_{target}
+(user_id, LOWER(TRIM(name)) text_pattern_ops)
+'''
+
+PREFIX_SQL = '''
+CREATE INDEX {target}_name_prefix_idx ON core_{target}
+(user_id, LOWER(TRIM(name)) text_pattern_ops)
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_token_version'),
+    ]
+
+    operations = [
+        operation
+        for target, table in [('tag', 'tags'), ('ingredient', 'ingredients')]
+        for operation in [
+            migrations.RunSQL(
+                DEDUPE_SQL.format(target=target, table=table),
+                reverse_sql=migrations.RunSQL.noop,
+            ),
+            migrations.RunSQL(
+                RECOUNT_SQL.format(target=target, table=table),
+                reverse_sql=migrations.RunSQL.noop,
+            ),
+            # Check the deferred foreign keys now, indexes can't be
+            # created on a table with pending trigger events.
+            migrations.RunSQL(
+                'SET CONSTRAINTS ALL IMMEDIATE;',
+                reverse_sql=migrations.RunSQL.noop,
+            ),
+            migrations.RunSQL(
+                UNIQUE_SQL.format(target=target),
+                reverse_sql=f'DROP INDEX {target}_user_name_uniq;',
+            ),
+            migrations.RunSQL(
+                f'DROP INDEX {target}_name_prefix_idx;',
+                reverse_sql=PREFIX_SQL.format(target=target),
+            ),
+        ]
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Users without recipes get their summary on their first recipe.
+BACKFILL_SQL = '''
+INSERT INTO core_recipesummary (
+    user_id, recipe_count, time_minutes_sum, time_minutes_min,
+    time_minutes_max, price_sum, price_min, price_max
+)
+SELECT
+    user_id, COUNT(*), SUM(time_minutes), MIN(time_minutes),
+    MAX(time_minutes), SUM(price), MIN(price), MAX(price)
+FROM core_recipe
+GROUP BY user_id
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_name_unique_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_summary', serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('time_minutes_sum', models.BigIntegerField(default=0)),
+                ('time_minutes_min', models.IntegerField(null=True)),
+                ('time_minutes_max', models.IntegerField(null=True)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+            ],
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
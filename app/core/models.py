@@ -6,11 +6,13 @@ import os
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
+from rest_framework.authtoken.models import Token
 
 
 def recipe_image_file_path(instance, filename):
@@ -34,6 +36,17 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def get_by_natural_key(self, email):
+        """Return the user with an email, ignoring its case."""
+        users = list(self.filter(email__iexact=email)[:2])
+        if not users:
+            raise self.model.DoesNotExist
+        # Emails differing only in case may exist, prefer an exact match.
+        for user in users:
+            if user.email == email:
+                return user
+        return users[0]
+
     def create_superuser(self, email, password):
         """Create and return a new superuser."""
         user = self.create_user(email, password)
@@ -50,11 +63,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Signed tokens carry this counter, bumping it revokes them.
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        # Logins look users up by email ignoring case, see UserManager.
+        indexes = [
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
+
+    def set_password(self, raw_password):
+        """Set the password and revoke the signed tokens issued so far."""
+        super().set_password(raw_password)
+        self.token_version += 1
+
 
 class Recipe(models.Model):
     """Recipe object."""
@@ -80,6 +106,25 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
 
+    class Meta:
+        # Recipe lists are filtered by user and sorted newest first, or by
+        # one of the sort fields with the id breaking ties.
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+            models.Index(
+                fields=['user', 'title', 'id'],
+                name='recipe_user_title_idx',
+            ),
+        ]
+
     def __str__(self):
         return str(self.title)
 
@@ -92,6 +137,28 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    # Number of recipes using this tag, kept in sync by core.signals.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Covers listing a user's tags by name from the index alone.
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                include=['id'],
+                name='tag_user_name_idx',
+            ),
+            models.Index(
+                fields=['user', 'name'],
+                condition=models.Q(recipe_count__gt=0),
+                name='tag_assigned_idx',
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', '-name'],
+                name='tag_popular_idx',
+            ),
+        ]
+
     def __str__(self):
         return str(self.name)
 
@@ -104,5 +171,79 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    # Number of recipes using this ingredient, kept in sync by core.signals.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Covers listing a user's ingredients by name from the index alone.
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                include=['id'],
+                name='ingredient_user_name_idx',
+            ),
+            models.Index(
+                fields=['user', 'name'],
+                condition=models.Q(recipe_count__gt=0),
+                name='ingredient_assigned_idx',
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', '-name'],
+                name='ingredient_popular_idx',
+            ),
+        ]
+
     def __str__(self):
         return str(self.name)
+
+
+class RecipeSummary(models.Model):
+    """
+    Totals over a user's recipes, kept in sync by core.signals.
+
+    Recipe counts per tag and ingredient are `recipe_count` on those.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='recipe_summary',
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    time_minutes_sum = models.BigIntegerField(default=0)
+    time_minutes_min = models.IntegerField(null=True)
+    time_minutes_max = models.IntegerField(null=True)
+    price_sum = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+    )
+    price_min = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    price_max = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+
+
+class TokenActivity(models.Model):
+    """When an auth token was last used, written in batches."""
+    token = models.OneToOneField(
+        Token,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='activity',
+    )
+    # Lags behind by up to TOKEN_ACTIVITY_FLUSH_INTERVAL, see
+    # core.authentication.
+    last_used = models.DateTimeField(db_index=True)
+
+
+class RefreshToken(models.Model):
+    """
+    A refresh token that hasn't been used yet.
+
+    Each works once: refreshing deletes it and issues the next one, see
+    core.authentication.
+    """
+    jti = models.CharField(max_length=32, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='refresh_tokens',
+    )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
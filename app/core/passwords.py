@@ -0,0 +1,91 @@
+"""
+Password hashing with a limit on concurrent hashes.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+
+
+class HasherBusy(exceptions.APIException):
+    """Raised when too many passwords are already waiting to be hashed."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins right now, try again shortly.')
+    default_code = 'hasher_busy'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as the Retry-After header by DRF's exception handler.
+        self.wait = wait
+
+
+class HashLimiter:
+    """
+    Limit how many passwords a process hashes at once.
+
+    Hashing runs on the calling thread, which is busy for the whole hash
+    either way. PBKDF2 releases the GIL, so up to `max_workers` threads
+    hash in parallel while the number of CPU-bound hashes is capped. At
+    most `max_queue` calls wait for their turn, further calls fail at
+    once with `HasherBusy` instead of piling up, holding every request
+    thread, during a login storm.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._running = threading.BoundedSemaphore(max_workers)
+
+    def run(self, func, *args):
+        """Call `func(*args)` once a slot is free and return its result."""
+        if not self._slots.acquire(blocking=False):
+            wait = getattr(settings, 'PASSWORD_HASH_RETRY_AFTER', 1)
+            raise HasherBusy(wait)
+        try:
+            with self._running:
+                return func(*args)
+        finally:
+            self._slots.release()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the hash limiter configured in settings."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None)
+            _limiter = HashLimiter(
+                workers or os.cpu_count() or 1,
+                getattr(settings, 'PASSWORD_HASH_QUEUE', 16),
+            )
+        return _limiter
+
+
+def _verify(password, encoded):
+    """Check a password, noting if its hash should be upgraded."""
+    outdated = []
+    valid = check_password(password, encoded, setter=outdated.append)
+    return valid, bool(outdated)
+
+
+def verify_password(password, encoded):
+    """
+    Return `(valid, outdated)` for a password and its stored hash.
+
+    `outdated` is True when the hash uses old parameters and should be
+    replaced by `hash_password(password)`.
+    """
+    return get_limiter().run(_verify, password, encoded)
+
+
+def hash_password(password):
+    """Return the hash of a password for storage."""
+    return get_limiter().run(make_password, password)
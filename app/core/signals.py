@@ -0,0 +1,136 @@
+"""
+Signal handlers that keep denormalized data in sync.
+"""
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core import summaries
+from core.authentication import forget_cached_user
+from core.models import (
+    User,
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+# Through table, counted model and its column in the through table.
+COUNTED_RELATIONS = {
+    Recipe.tags.through: (Tag, 'tag_id'),
+    Recipe.ingredients.through: (Ingredient, 'ingredient_id'),
+}
+
+
+def _add_to_count(queryset, delta):
+    """Add `delta` to the recipe count of every row in `queryset`."""
+    if delta:
+        queryset.update(recipe_count=F('recipe_count') + delta)
+
+
+def _update_recipe_counts(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Update recipe counts when recipes gain or lose tags/ingredients."""
+    target, column = COUNTED_RELATIONS[sender]
+    links = sender.objects.all()
+    """
+    Removals are counted before the rows are deleted, so only links that
+    actually exist are subtracted. Django runs the pre and post signals
+    in the same transaction as the change itself.
+    """
+    if not reverse:
+        # `instance` is a recipe and `pk_set` holds tag/ingredient IDs.
+        links = links.filter(recipe_id=instance.pk)
+        if action == 'post_add':
+            # Django only reports the IDs that were actually inserted.
+            _add_to_count(target.objects.filter(pk__in=pk_set), 1)
+        elif action == 'pre_remove':
+            linked = links.filter(**{f'{column}__in': pk_set})
+            _add_to_count(
+                target.objects.filter(pk__in=linked.values(column)), -1,
+            )
+        elif action == 'pre_clear':
+            _add_to_count(
+                target.objects.filter(pk__in=links.values(column)), -1,
+            )
+    else:
+        # `instance` is a tag/ingredient and `pk_set` holds recipe IDs.
+        links = links.filter(**{column: instance.pk})
+        counted = target.objects.filter(pk=instance.pk)
+        if action == 'post_add':
+            _add_to_count(counted, len(pk_set))
+        elif action == 'pre_remove':
+            removed = links.filter(recipe_id__in=pk_set).count()
+            _add_to_count(counted, -removed)
+        elif action == 'pre_clear':
+            counted.update(recipe_count=0)
+
+
+for through in COUNTED_RELATIONS:
+    m2m_changed.connect(
+        _update_recipe_counts,
+        sender=through,
+        dispatch_uid=f'update_recipe_counts_{through._meta.db_table}',
+    )
+
+
+@receiver(pre_delete, sender=Recipe, dispatch_uid='recipe_pre_delete_counts')
+def _release_recipe_counts(sender, instance, **kwargs):
+    """Decrement counts for a recipe that is about to be deleted."""
+    """
+    The through rows of a deleted recipe are removed by the delete
+    collector without sending `m2m_changed`, so handle them here.
+    """
+    for through, (target, column) in COUNTED_RELATIONS.items():
+        links = through.objects.filter(recipe_id=instance.pk)
+        _add_to_count(target.objects.filter(pk__in=links.values(column)), -1)
+
+
+@receiver(pre_save, sender=Recipe, dispatch_uid='recipe_save_summarized')
+def _remember_summarized(sender, instance, update_fields=None, **kwargs):
+    """Note what a changed recipe added to its user's summary."""
+    instance._summarized = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not (
+        {'user', 'time_minutes', 'price'} & set(update_fields)
+    ):
+        return
+    instance._summarized = Recipe.objects.filter(pk=instance.pk).values_list(
+        'user_id', 'time_minutes', 'price',
+    ).first()
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid='recipe_save_summary')
+def _update_summary(sender, instance, created, **kwargs):
+    """Add a new or changed recipe to its user's summary."""
+    new = (instance.user_id, *summaries.normalize(
+        instance.time_minutes, instance.price,
+    ))
+    old = None if created else getattr(instance, '_summarized', None)
+    if old == new or (old is None and not created):
+        return
+    if old is not None:
+        summaries.subtract(old[0], summaries.summarize([old[1:]]))
+    summaries.add(new[0], summaries.summarize([new[1:]]))
+
+
+@receiver(post_delete, sender=Recipe, dispatch_uid='recipe_delete_summary')
+def _subtract_from_summary(sender, instance, **kwargs):
+    """Take a deleted recipe out of its user's summary."""
+    summaries.subtract(instance.user_id, summaries.summarize([
+        (instance.time_minutes, instance.price),
+    ]))
+
+
+@receiver(post_save, sender=User, dispatch_uid='user_forget_cached')
+@receiver(post_delete, sender=User, dispatch_uid='user_delete_forget_cached')
+def _forget_cached_user(sender, instance, **kwargs):
+    """Drop a changed user from the signed token cache."""
+    forget_cached_user(instance.pk)
@@ -0,0 +1,165 @@
+"""
+Slow query log with request context and optional EXPLAIN output.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import middleware
+from core.middleware import current_view
+
+
+logger = logging.getLogger(__name__)
+
+# Files of execute wrappers, which are never the origin of a query.
+WRAPPER_FILES = {__file__, middleware.__file__}
+
+# Longest params logged with `SLOW_QUERY_LOG_PARAMS`, in characters.
+MAX_PARAMS_LENGTH = 500
+
+
+class SlowQueryLog:
+    """
+    Database execute wrapper that logs queries slower than a threshold.
+
+    Logged queries are sampled with `SLOW_QUERY_SAMPLE_RATE` and capped
+    at `SLOW_QUERY_MAX_PER_MINUTE` per process, so a bad query in a hot
+    path can't flood the logs or double the database load with EXPLAINs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new rate limiting window."""
+        with self._lock:
+            self._window_start = time.monotonic()
+            self._logged = 0
+
+    def _acquire(self):
+        """Return True if one more query may be logged in this window."""
+        limit = getattr(settings, 'SLOW_QUERY_MAX_PER_MINUTE', 10)
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start, self._logged = now, 0
+            if self._logged >= limit:
+                return False
+            self._logged += 1
+            return True
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        if threshold is None:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - start) * 1000
+
+        if duration < threshold:
+            return result
+        sample_rate = getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+        if random.random() < sample_rate and self._acquire():
+            self.log(sql, params, many, duration, context['connection'])
+        return result
+
+    def log(self, sql, params, many, duration, connection):
+        """Log a slow query with where it came from."""
+        lines = [
+            f'Slow query: {duration:.1f} ms, '
+            f'view {current_view.get() or "-"}, at {caller()}',
+            f'SQL: {sql}',
+            f'Params: {format_params(params, many)}',
+        ]
+        if getattr(settings, 'SLOW_QUERY_EXPLAIN', False) and not many:
+            plan = explain(sql, params, connection)
+            if plan:
+                lines += ['Plan:', plan]
+        logger.warning(
+            '\n'.join(lines),
+            extra={
+                'duration_ms': duration,
+                'sql': sql,
+                'view': current_view.get(),
+            },
+        )
+
+
+def format_params(params, many):
+    """
+    Return the params of a query for the log.
+
+    Params hold token keys, password hashes and other secrets, so only
+    their types are logged, unless `SLOW_QUERY_LOG_PARAMS` is set while
+    debugging. Then their values are logged, truncated.
+    """
+    if getattr(settings, 'SLOW_QUERY_LOG_PARAMS', False):
+        text = repr(params)
+        if len(text) > MAX_PARAMS_LENGTH:
+            text = text[:MAX_PARAMS_LENGTH] + '...'
+        return text
+    if not params:
+        return repr(params)
+    if many:
+        # Possibly an iterator already consumed by the query.
+        return '<redacted>'
+    if isinstance(params, dict):
+        types = [f'{name}: <{type(value).__name__}>'
+                 for name, value in params.items()]
+        return '{' + ', '.join(types) + '}'
+    types = [f'<{type(value).__name__}>' for value in params]
+    return '(' + ', '.join(types) + ')'
+
+
+def caller():
+    """Return the innermost project frame that led to the query."""
+    base_dir = str(settings.BASE_DIR) + os.sep
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base_dir) \
+                and frame.filename not in WRAPPER_FILES:
+            path = os.path.relpath(frame.filename, base_dir)
+            return f'{path}:{frame.lineno} in {frame.name}'
+    return '-'
+
+
+def explain(sql, params, connection):
+    """Return the EXPLAIN (ANALYZE, BUFFERS) output of a SELECT query."""
+    if connection.vendor != 'postgresql' \
+            or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    # Use the raw DB-API cursor so the EXPLAIN itself isn't wrapped, and a
+    # savepoint so a failing EXPLAIN can't break the caller's transaction.
+    in_transaction = connection.in_atomic_block
+    with connection.connection.cursor() as cursor:
+        try:
+            if in_transaction:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        except Exception:
+            logger.debug('Unable to explain slow query.', exc_info=True)
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None
+
+
+slow_query_log = SlowQueryLog()
+
+
+@receiver(connection_created, dispatch_uid='install_slow_query_log')
+def install_slow_query_log(sender, connection, **kwargs):
+    """Time every query made through new database connections."""
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
@@ -0,0 +1,177 @@
+"""
+Incremental upkeep of the per-user recipe summaries.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import Recipe, RecipeSummary
+
+
+ADD_SQL = '''
+INSERT INTO {table} AS s (
+    user_id, recipe_count, time_minutes_sum, time_minutes_min,
+    time_minutes_max, price_sum, price_min, price_max
+)
+VALUES (
+    %(user)s, %(count)s, %(time_minutes_sum)s, %(time_minutes_min)s,
+    %(time_minutes_max)s, %(price_sum)s, %(price_min)s, %(price_max)s
+)
+ON CONFLICT (user_id) DO UPDATE SET
+    recipe_count = s.recipe_count + EXCLUDED.recipe_count,
+    time_minutes_sum = s.time_minutes_sum + EXCLUDED.time_minutes_sum,
+    time_minutes_min = LEAST(s.time_minutes_min, EXCLUDED.time_minutes_min),
+    time_minutes_max = GREATEST(
+        s.time_minutes_max, EXCLUDED.time_minutes_max
+    ),
+    price_sum = s.price_sum + EXCLUDED.price_sum,
+    price_min = LEAST(s.price_min, EXCLUDED.price_min),
+    price_max = GREATEST(s.price_max, EXCLUDED.price_max)
+'''
+
+# Taken before SUBTRACT_SQL. It waits for concurrent removals of the user's
+# recipes to commit, and the UPDATE, a statement of its own, then takes a
+# snapshot that sees them gone. Otherwise both could look up a minimum or
+# maximum among recipes the other one removed.
+LOCK_SQL = '''
+SELECT 1 FROM {table} WHERE user_id = %(user)s FOR UPDATE
+'''
+
+# Runs once the recipes are gone. A minimum or maximum is only looked up
+# again when a removed recipe held it, PostgreSQL evaluates the subquery
+# of the other CASE branch lazily.
+SUBTRACT_SQL = '''
+UPDATE {table} AS s SET
+    recipe_count = s.recipe_count - %(count)s,
+    time_minutes_sum = s.time_minutes_sum - %(time_minutes_sum)s,
+    price_sum = s.price_sum - %(price_sum)s,
+    time_minutes_min = CASE
+        WHEN s.time_minutes_min < %(time_minutes_min)s
+        THEN s.time_minutes_min
+        ELSE (SELECT MIN(time_minutes) FROM {recipe} WHERE user_id = s.user_id)
+    END,
+    time_minutes_max = CASE
+        WHEN s.time_minutes_max > %(time_minutes_max)s
+        THEN s.time_minutes_max
+        ELSE (SELECT MAX(time_minutes) FROM {recipe} WHERE user_id = s.user_id)
+    END,
+    price_min = CASE
+        WHEN s.price_min < %(price_min)s THEN s.price_min
+        ELSE (SELECT MIN(price) FROM {recipe} WHERE user_id = s.user_id)
+    END,
+    price_max = CASE
+        WHEN s.price_max > %(price_max)s THEN s.price_max
+        ELSE (SELECT MAX(price) FROM {recipe} WHERE user_id = s.user_id)
+    END
+WHERE s.user_id = %(user)s
+'''
+
+# Only rows that differ from the recipes are written.
+REBUILD_SQL = '''
+INSERT INTO {table} AS s (
+    user_id, recipe_count, time_minutes_sum, time_minutes_min,
+    time_minutes_max, price_sum, price_min, price_max
+)
+SELECT
+    u.id, COUNT(r.id), COALESCE(SUM(r.time_minutes), 0), MIN(r.time_minutes),
+    MAX(r.time_minutes), COALESCE(SUM(r.price), 0), MIN(r.price), MAX(r.price)
+FROM {user} AS u
+LEFT JOIN {recipe} AS r ON r.user_id = u.id
+WHERE u.id BETWEEN %(first)s AND %(last)s {users}
+GROUP BY u.id
+ON CONFLICT (user_id) DO UPDATE SET
+    recipe_count = EXCLUDED.recipe_count,
+    time_minutes_sum = EXCLUDED.time_minutes_sum,
+    time_minutes_min = EXCLUDED.time_minutes_min,
+    time_minutes_max = EXCLUDED.time_minutes_max,
+    price_sum = EXCLUDED.price_sum,
+    price_min = EXCLUDED.price_min,
+    price_max = EXCLUDED.price_max
+WHERE (
+    s.recipe_count, s.time_minutes_sum, s.time_minutes_min,
+    s.time_minutes_max, s.price_sum, s.price_min, s.price_max
+) IS DISTINCT FROM (
+    EXCLUDED.recipe_count, EXCLUDED.time_minutes_sum,
+    EXCLUDED.time_minutes_min, EXCLUDED.time_minutes_max,
+    EXCLUDED.price_sum, EXCLUDED.price_min, EXCLUDED.price_max
+)
+'''
+
+
+def normalize(time_minutes, price):
+    """
+    Return the time and price of a recipe the way the database stores them.
+
+    Unsaved or just saved instances may hold any input the fields accept,
+    like strings.
+    """
+    decimal_places = Recipe._meta.get_field('price').decimal_places
+    return (
+        int(time_minutes),
+        Decimal(str(price)).quantize(
+            Decimal(1).scaleb(-decimal_places), ROUND_HALF_UP,
+        ),
+    )
+
+
+def summarize(recipes):
+    """Return the totals of `(time_minutes, price)` pairs."""
+    recipes = [normalize(*recipe) for recipe in recipes]
+    times = [time_minutes for time_minutes, _ in recipes]
+    prices = [price for _, price in recipes]
+    return {
+        'count': len(recipes),
+        'time_minutes_sum': sum(times),
+        'time_minutes_min': min(times),
+        'time_minutes_max': max(times),
+        'price_sum': sum(prices),
+        'price_min': min(prices),
+        'price_max': max(prices),
+    }
+
+
+def _execute(sql, user_id, totals):
+    sql = sql.format(
+        table=RecipeSummary._meta.db_table,
+        recipe=Recipe._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, dict(totals, user=user_id))
+
+
+def add(user_id, totals):
+    """Add recipes with `totals` to the summary of a user."""
+    if totals['count']:
+        _execute(ADD_SQL, user_id, totals)
+
+
+def subtract(user_id, totals):
+    """Take recipes with `totals` out of a user's summary after removal."""
+    if totals['count']:
+        with transaction.atomic(savepoint=False):
+            _execute(LOCK_SQL, user_id, totals)
+            _execute(SUBTRACT_SQL, user_id, totals)
+
+
+def rebuild(first_id, last_id, user_ids=None):
+    """
+    Recompute the summaries of users with IDs from `first_id` to `last_id`.
+
+    Limited to `user_ids` if given. Returns the number of summaries that
+    were missing or wrong.
+    """
+    params = {'first': first_id, 'last': last_id}
+    users = ''
+    if user_ids is not None:
+        users = 'AND u.id = ANY(%(users)s)'
+        params['users'] = list(user_ids)
+    sql = REBUILD_SQL.format(
+        table=RecipeSummary._meta.db_table,
+        user=get_user_model()._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        users=users,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -0,0 +1,40 @@
+"""
+Test runner for the project.
+"""
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from core.throttling import TokenBucketThrottle
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests without throttling.
+
+    Every request of the suite would otherwise draw from the same
+    buckets, and ids of test users repeat between runs, so unrelated
+    tests would get 429s. Rates are switched off and the store is a
+    file of this run only. Tests of throttling patch in their rates.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_dir = tempfile.TemporaryDirectory()
+        self._store_path = getattr(settings, 'THROTTLE_STORE_PATH', None)
+        settings.THROTTLE_STORE_PATH = os.path.join(
+            self._throttle_dir.name, 'throttle.bin',
+        )
+        self._unthrottled = patch.object(
+            TokenBucketThrottle, 'THROTTLE_RATES', {},
+        )
+        self._unthrottled.start()
+
+    def teardown_test_environment(self, **kwargs):
+        self._unthrottled.stop()
+        settings.THROTTLE_STORE_PATH = self._store_path
+        self._throttle_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
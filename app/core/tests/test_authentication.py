@@ -0,0 +1,379 @@
+"""
+Tests for expiring token authentication.
+"""
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from core.authentication import (
+    ActivityBuffer,
+    SignedTokenAuthentication,
+    user_cache_key,
+    expired_filter,
+    issue_token,
+)
+from core.models import RefreshToken, TokenActivity
+
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+REFRESH_TOKEN_URL = reverse('user:token-refresh')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def age_token(token, seconds):
+    """Move the creation of a token `seconds` into the past."""
+    token.created = timezone.now() - timedelta(seconds=seconds)
+    Token.objects.filter(pk=token.pk).update(created=token.created)
+
+
+@override_settings(TOKEN_TTL=3600, TOKEN_SLIDING=False)
+class ExpiringTokenTests(TestCase):
+    """Test tokens expire."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_valid_token_accepted(self):
+        """Test a token within its lifetime authenticates."""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        """Test a token older than TOKEN_TTL is rejected."""
+        age_token(self.token, 3601)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data['detail'], 'Token has expired.')
+
+    @override_settings(TOKEN_SLIDING=True)
+    def test_sliding_expiry(self):
+        """Test recent use keeps an old token valid with TOKEN_SLIDING."""
+        age_token(self.token, 3601)
+        TokenActivity.objects.create(
+            token=self.token,
+            last_used=timezone.now() - timedelta(seconds=600),
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            Token.objects.filter(expired_filter()).exists()
+        )
+
+    def test_expired_token_replaced_on_login(self):
+        """Test logging in again issues a new token once it expired."""
+        age_token(self.token, 3601)
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertTrue(Token.objects.filter(key=res.data['token']).exists())
+
+    def test_valid_token_reused_on_login(self):
+        """Test logging in returns the existing token while valid."""
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        })
+
+        self.assertEqual(res.data['token'], self.token.key)
+
+    def test_purge_tokens(self):
+        """Test the purge_tokens command deletes only expired tokens."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        expired = Token.objects.create(user=other)
+        age_token(expired, 3601)
+        TokenActivity.objects.create(token=expired, last_used=timezone.now())
+        out = StringIO()
+
+        call_command('purge_tokens', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            list(Token.objects.values_list('key', flat=True)),
+            [self.token.key],
+        )
+        self.assertFalse(TokenActivity.objects.exists())
+        self.assertIn('Purged 1 expired tokens', out.getvalue())
+
+
+@override_settings(TOKEN_TTL=3600, TOKEN_SLIDING=False)
+class IssueTokenConcurrencyTests(TransactionTestCase):
+    """Test concurrent logins replacing an expired token."""
+
+    def test_concurrent_logins_share_new_token(self):
+        """Test only one login replaces the token, the others reuse it."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        expired = Token.objects.create(user=user)
+        age_token(expired, 3601)
+        barrier = threading.Barrier(4)
+        keys, errors = [], []
+
+        def login():
+            try:
+                barrier.wait()
+                keys.append(issue_token(user).key)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=login) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(keys)), 1)
+        self.assertNotEqual(keys[0], expired.key)
+        self.assertEqual(
+            list(Token.objects.values_list('key', flat=True)), keys[:1],
+        )
+
+
+@override_settings(
+    TOKEN_ACTIVITY_FLUSH_INTERVAL=3600, TOKEN_ACTIVITY_RESOLUTION=60,
+)
+class ActivityBufferTests(TestCase):
+    """Test token uses are written in batches."""
+
+    def setUp(self):
+        self.buffer = ActivityBuffer()
+        self.tokens = [
+            Token.objects.create(
+                user=get_user_model().objects.create_user(
+                    email=f'user{i}@example.com', password='testpass123',
+                ),
+            )
+            for i in range(3)
+        ]
+
+    def test_uses_written_in_one_statement(self):
+        """Test uses are only written on flush, all at once."""
+        for token in self.tokens:
+            self.buffer.record(token)
+        self.assertFalse(TokenActivity.objects.exists())
+
+        with self.assertNumQueries(3):  # Savepoint, upsert, release.
+            self.buffer.flush()
+
+        self.assertEqual(TokenActivity.objects.count(), 3)
+
+    def test_recent_use_not_recorded(self):
+        """Test uses within the resolution of the stored time are skipped."""
+        token = self.tokens[0]
+        last_used = timezone.now() - timedelta(seconds=30)
+        token.activity = TokenActivity.objects.create(
+            token=token, last_used=last_used,
+        )
+
+        self.buffer.record(token)
+        self.buffer.flush()
+
+        token.activity.refresh_from_db()
+        self.assertEqual(token.activity.last_used, last_used)
+
+    def test_flush_keeps_latest_use(self):
+        """Test an older pending use doesn't overwrite a newer one."""
+        token = self.tokens[0]
+        now = timezone.now()
+        TokenActivity.objects.create(token=token, last_used=now)
+
+        self.buffer.record(token, now=now - timedelta(seconds=120))
+        self.buffer.flush()
+
+        self.assertEqual(TokenActivity.objects.get().last_used, now)
+
+    def test_flush_skips_deleted_tokens(self):
+        """Test uses of tokens deleted meanwhile are dropped."""
+        for token in self.tokens:
+            self.buffer.record(token)
+        self.tokens[0].delete()
+
+        self.buffer.flush()
+
+        self.assertEqual(TokenActivity.objects.count(), 2)
+
+
+@override_settings(ACCESS_TOKEN_TTL=300, REFRESH_TOKEN_TTL=3600)
+class SignedTokenTests(TestCase):
+    """Test signed access tokens and their refresh."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.tokens = res.data
+
+    def get_recipes(self, access):
+        """Return the response to listing recipes with an access token."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.get(RECIPES_URL)
+
+    def test_access_token_accepted(self):
+        """Test an access token authenticates recipe requests."""
+        res = self.get_recipes(self.tokens['access'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tokens['expires_in'], 300)
+
+    def test_access_token_needs_no_query(self):
+        """Test verifying an access token uses the cached user."""
+        auth = SignedTokenAuthentication()
+        auth.authenticate_credentials(self.tokens['access'])
+
+        with self.assertNumQueries(0):
+            user, _ = auth.authenticate_credentials(self.tokens['access'])
+
+        self.assertEqual(user, self.user)
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a wrong signature is rejected."""
+        res = self.get_recipes(self.tokens['access'][:-1] + 'x')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_access_token_rejected(self):
+        """Test an access token older than ACCESS_TOKEN_TTL is rejected."""
+        auth = SignedTokenAuthentication()
+        later = time.time() + 301
+
+        with patch('django.core.signing.time.time', return_value=later):
+            with self.assertRaisesMessage(
+                AuthenticationFailed, 'Token has expired.',
+            ):
+                auth.authenticate_credentials(self.tokens['access'])
+
+    def test_refresh(self):
+        """Test a refresh token gets new working tokens."""
+        res = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': self.tokens['refresh']},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_recipes(res.data['access']).status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_refresh_token_rotated(self):
+        """Test each refresh token works once, the new one works next."""
+        res = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': self.tokens['refresh']},
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], self.tokens['refresh'])
+
+        reused = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': self.tokens['refresh']},
+        )
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(reused.data['detail'], 'Token has been revoked.')
+
+        res = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': res.data['refresh']},
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(RefreshToken.objects.count(), 1)
+
+    def test_sessions_refresh_independently(self):
+        """Test refreshing one login leaves another login's token valid."""
+        other = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        }).data
+
+        for tokens in [self.tokens, other]:
+            res = self.client.post(
+                REFRESH_TOKEN_URL, {'refresh': tokens['refresh']},
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_purge_expired_refresh_tokens(self):
+        """Test purge_tokens deletes refresh tokens past their lifetime."""
+        RefreshToken.objects.update(
+            created=timezone.now() - timedelta(seconds=3601),
+        )
+        out = StringIO()
+
+        call_command('purge_tokens', stdout=out)
+
+        self.assertFalse(RefreshToken.objects.exists())
+        self.assertIn('1 expired refresh tokens', out.getvalue())
+
+    def test_cache_holds_no_password(self):
+        """Test only the fields checking tokens are cached."""
+        self.get_recipes(self.tokens['access'])
+
+        cached = cache.get(user_cache_key(self.user.pk))
+
+        self.assertNotIn(self.user.password, cached)
+        self.assertEqual(
+            sorted(map(str, cached)),
+            sorted(map(str, [self.user.pk, True, self.user.token_version])),
+        )
+
+    def test_cached_user_loads_other_fields(self):
+        """Test fields left out of the cache are loaded on access."""
+        auth = SignedTokenAuthentication()
+        user, _ = auth.authenticate_credentials(self.tokens['access'])
+
+        self.assertEqual(user.email, 'user@example.com')
+
+    def test_access_token_cannot_refresh(self):
+        """Test access tokens aren't accepted as refresh tokens."""
+        res = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': self.tokens['access']},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes(self):
+        """Test changing the password revokes the signed tokens."""
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        res = self.get_recipes(self.tokens['access'])
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data['detail'], 'Token has been revoked.')
+        res = self.client.post(
+            REFRESH_TOKEN_URL, {'refresh': self.tokens['refresh']},
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,34 +1,344 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count, F
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 
+from core.management.commands import (
+    benchmark_api,
+    migrate_if_needed,
+    profile_startup,
+)
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.management.commands.wait_for_db.Command.probe')
 class CommandTests(SimpleTestCase):
     """Test commands."""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database if database ready."""
-        patched_check.return_value = True
+        patched_probe.return_value = None
 
         call_command('wait_for_db')
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default')
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for database when getting OperationalError."""
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_probe.side_effect = [Psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 6)
+        patched_probe.assert_called_with('default')
+        # The delay doubles after every attempt, with jitter.
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, 0.05 * 2 ** attempt)
+            self.assertGreaterEqual(delay, 0.05 * 2 ** attempt / 2)
+
+    @patch('time.sleep')
+    def test_wait_for_db_max_delay(self, patched_sleep, patched_probe):
+        """Test the delay between attempts is capped."""
+        patched_probe.side_effect = [OperationalError] * 10 + [None]
+
+        call_command('wait_for_db', max_delay=0.5, stdout=StringIO())
+
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        self.assertLessEqual(max(delays), 0.5)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        """Test giving up once the deadline has passed."""
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaisesMessage(CommandError, 'unavailable after'):
+            call_command('wait_for_db', timeout=0.01, stdout=StringIO())
+
+    def test_wait_for_db_several_databases(self, patched_probe):
+        """Test waiting for several database aliases."""
+        replica = connections.settings['default']
+        with patch.dict(connections.settings, replica=replica):
+            call_command(
+                'wait_for_db', database=['default', 'replica'],
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(
+            sorted(c.args[0] for c in patched_probe.call_args_list),
+            ['default', 'replica'],
+        )
+
+    def test_wait_for_db_unknown_database(self, patched_probe):
+        """Test unknown aliases are rejected."""
+        with self.assertRaisesMessage(CommandError, 'Unknown databases'):
+            call_command('wait_for_db', database=['missing'])
+
+
+class RepairRecipeCountsTests(TestCase):
+    """Test the repair_recipe_counts command."""
+
+    def test_repair_recipe_counts(self):
+        """Test drifted counts are recomputed from the through tables."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        tag = Tag.objects.create(user=user, name='Vegan')
+        unused = Tag.objects.create(user=user, name='Unused')
+        ingredient = Ingredient.objects.create(user=user, name='Kale')
+        for title in ['Kale salad', 'Kale soup']:
+            recipe = Recipe.objects.create(
+                user=user,
+                title=title,
+                time_minutes=10,
+                price=Decimal('4.00'),
+            )
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        Tag.objects.update(recipe_count=7)
+        Ingredient.objects.update(recipe_count=0)
+
+        out = StringIO()
+        call_command('repair_recipe_counts', stdout=out)
+
+        tag.refresh_from_db()
+        unused.refresh_from_db()
+        ingredient.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 2)
+        self.assertEqual(unused.recipe_count, 0)
+        self.assertEqual(ingredient.recipe_count, 2)
+        self.assertIn('Tag: repaired 2 recipe counts.', out.getvalue())
+
+
+class BenchmarkApiTests(TestCase):
+    """Test the benchmark_api command."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = os.path.join(tmp.name, 'benchmark.json')
+
+    def run_benchmark(self, **options):
+        call_command(
+            'benchmark_api',
+            users=1,
+            recipes=3,
+            requests=4,
+            concurrency=1,
+            scenarios='list,detail,create,update,filter',
+            output=self.output,
+            stdout=StringIO(),
+            stderr=StringIO(),
+            **options,
+        )
+        with open(self.output) as f:
+            return json.load(f)
+
+    def test_benchmark_reports_latency(self):
+        """Test each scenario reports throughput and percentiles."""
+        report = self.run_benchmark()
+
+        self.assertEqual(
+            list(report['scenarios']),
+            ['list', 'detail', 'create', 'update', 'filter'],
+        )
+        for result in report['scenarios'].values():
+            self.assertEqual(result['requests'], 4)
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['throughput_rps'], 0)
+            self.assertEqual(
+                set(result['latency_ms']), {'mean', 'p50', 'p95', 'p99'},
+            )
+        # The seeded data is removed afterwards.
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_fails_on_regression(self):
+        """Test a slower run than the baseline fails the command."""
+        baseline = {'scenarios': {'list': {
+            'throughput_rps': 1e9,
+            'latency_ms': {'p95': 1e-9},
+        }}}
+        baseline_path = os.path.join(os.path.dirname(self.output), 'b.json')
+        with open(baseline_path, 'w') as f:
+            json.dump(baseline, f)
+
+        with self.assertRaisesMessage(CommandError, 'list: p95'):
+            self.run_benchmark(baseline=baseline_path)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+
+        self.assertEqual(benchmark_api.percentile(values, 50), 50)
+        self.assertEqual(benchmark_api.percentile(values, 99), 99)
+        self.assertEqual(benchmark_api.percentile([7], 95), 7)
+
+
+class SeedDataTests(TestCase):
+    """Test the seed_data command."""
+
+    def seed(self, **options):
+        defaults = {
+            'users': 3,
+            'recipes_per_user': 5,
+            'tags_per_user': 4,
+            'ingredients_per_user': 6,
+            'batch_users': 2,
+            'stdout': StringIO(),
+        }
+        call_command('seed_data', **{**defaults, **options})
+
+    def snapshot(self):
+        return list(Recipe.objects.order_by('id').values_list(
+            'user__email', 'title', 'time_minutes', 'price',
+        ))
+
+    def test_seed_data_creates_dataset(self):
+        """Test users, their data and consistent recipe counts."""
+        self.seed(user_skew=0)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Recipe.objects.count(), 15)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(Ingredient.objects.count(), 18)
+        user = get_user_model().objects.get(email='seed-0@example.com')
+        self.assertTrue(user.check_password('seedpass123'))
+        for model, field in [(Tag, 'recipe'), (Ingredient, 'recipe')]:
+            for obj in model.objects.annotate(actual=Count(field)):
+                self.assertEqual(obj.recipe_count, obj.actual)
+        self.assertTrue(Recipe.objects.filter(
+            tags__user=F('user'), ingredients__user=F('user'),
+        ).exists())
+        self.assertFalse(Recipe.objects.exclude(tags__user=F('user')).filter(
+            tags__isnull=False,
+        ).exists())
+
+    def test_seed_data_is_deterministic(self):
+        """Test the same seed generates the same data."""
+        self.seed(seed=7)
+        first = self.snapshot()
+        get_user_model().objects.all().delete()
+
+        self.seed(seed=7)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_data_refuses_existing_prefix(self):
+        """Test seeding twice with one email prefix is an error."""
+        self.seed(users=1)
+
+        with self.assertRaises(CommandError):
+            self.seed(users=1)
+
+
+@patch('core.management.commands.migrate_if_needed.call_command')
+class MigrateIfNeededTests(TestCase):
+    """Test the migrate_if_needed command."""
+
+    def test_nothing_pending(self, patched_call_command):
+        """Test migrate isn't run when every migration is applied."""
+        out = StringIO()
+
+        with self.assertNumQueries(1):
+            call_command('migrate_if_needed', stdout=out)
+
+        patched_call_command.assert_not_called()
+        self.assertIn('No migrations to apply.', out.getvalue())
+
+    def test_pending_migrations_applied(self, patched_call_command):
+        """Test migrate is run when a migration isn't applied yet."""
+        MigrationRecorder.Migration.objects.filter(
+            app='core', name='0001_initial',
+        ).delete()
+
+        call_command('migrate_if_needed', stdout=StringIO())
+
+        patched_call_command.assert_called_once()
+        self.assertEqual(patched_call_command.call_args.args, ('migrate',))
+
+    def test_disk_migrations(self, patched_call_command):
+        """Test migration files are listed like Django's loader does."""
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+
+        self.assertEqual(
+            migrate_if_needed.disk_migrations(),
+            set(loader.disk_migrations),
+        )
+
+
+class ProfileStartupTests(SimpleTestCase):
+    """Test the profile_startup command."""
+
+    def test_profile_startup(self):
+        """Test startup timings and import times are reported."""
+        out = StringIO()
+
+        call_command('profile_startup', runs=1, json=True, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['status'], '401 Unauthorized')
+        self.assertGreater(report['load_ms'], 0)
+        self.assertGreater(report['first_request_ms'], 0)
+        self.assertIn('django', dict(report['packages']))
+
+    def test_parse_importtime(self):
+        """Test parsing the output of python -X importtime."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   _io\n'
+            'import time:      1500 |       1620 | io\n'
+            'unrelated output\n'
+        )
+
+        self.assertEqual(profile_startup.parse_importtime(output), [
+            ('_io', 120, 120),
+            ('io', 1500, 1620),
+        ])
+
+
+class BenchmarkLoginTests(TestCase):
+    """Test the benchmark_login command."""
+
+    def test_benchmark_login(self):
+        """Test logins are counted by status and the users removed."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_login',
+            users=2,
+            requests=6,
+            concurrency=1,
+            failed=0.5,
+            stdout=out,
+        )
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['requests'], 6)
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(sum(report['statuses'].values()), 6)
+        self.assertEqual(set(report['statuses']) - {'200', '400'}, set())
+        self.assertFalse(get_user_model().objects.exists())
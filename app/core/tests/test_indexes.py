@@ -0,0 +1,166 @@
+"""
+Tests for the indexes backing the hot per-user queries.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.autocomplete import normalized_name
+
+
+class IndexUsageTests(TransactionTestCase):
+    """Check the query planner uses the indexes on seeded data."""
+
+    def setUp(self):
+        users = [
+            get_user_model().objects.create_user(
+                email=f'user{i}@example.com',
+                password='testpass123',
+            )
+            for i in range(5)
+        ]
+        self.user = users[0]
+        for user in users:
+            tags = Tag.objects.bulk_create(
+                Tag(user=user, name=f'Tag {i}') for i in range(300)
+            )
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(user=user, name=f'Ingredient {i}')
+                for i in range(300)
+            )
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    user=user,
+                    title=f'Recipe {i}',
+                    time_minutes=i % 90,
+                    price=Decimal('5.00'),
+                )
+                for i in range(500)
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag=tags[i % 300])
+                for i, recipe in enumerate(recipes)
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                Recipe.ingredients.through(
+                    recipe=recipe, ingredient=ingredients[i % 300],
+                )
+                for i, recipe in enumerate(recipes)
+            )
+        self.tag_ids = [t.id for t in Tag.objects.filter(user=self.user)[:2]]
+        self.ingredient_ids = [
+            i.id for i in Ingredient.objects.filter(user=self.user)[:2]
+        ]
+        with connection.cursor() as cursor:
+            # VACUUM can't run in a transaction, hence TransactionTestCase.
+            cursor.execute('VACUUM ANALYZE')
+            # The seeded tables are small enough for a sequential scan to
+            # win, so rule it out to see which index the planner picks.
+            cursor.execute('SET enable_seqscan = off')
+            cursor.execute('SET enable_bitmapscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+            cursor.execute('RESET enable_bitmapscan')
+
+    def test_recipe_list_uses_user_id_index(self):
+        """Test a page of recipes is read in order from the index."""
+        plan = Recipe.objects.filter(
+            user=self.user,
+        ).order_by('-id')[:20].explain()
+
+        self.assertIn('recipe_user_id_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_recipe_sorting_uses_composite_indexes(self):
+        """Test range filtered and sorted pages are read from an index."""
+        for ordering, index in [
+            (['time_minutes', 'id'], 'recipe_user_time_idx'),
+            (['-price', '-id'], 'recipe_user_price_idx'),
+            (['title', 'id'], 'recipe_user_title_idx'),
+        ]:
+            with self.subTest(index=index):
+                plan = Recipe.objects.filter(
+                    user=self.user,
+                    time_minutes__gte=10,
+                    time_minutes__lte=30,
+                ).order_by(*ordering)[:20].explain()
+
+                self.assertIn(index, plan)
+                self.assertNotIn('Sort', plan)
+
+    def test_tag_list_uses_covering_index(self):
+        """Test listing tags reads them in order from the index."""
+        plan = Tag.objects.filter(user=self.user).order_by('-name').values(
+            'id', 'name',
+        ).explain()
+
+        self.assertIn('tag_user_name_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_ingredient_list_uses_covering_index(self):
+        """Test listing ingredients reads them in order from the index."""
+        plan = Ingredient.objects.filter(user=self.user).order_by(
+            '-name'
+        ).values('id', 'name').explain()
+
+        self.assertIn('ingredient_user_name_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_filter_by_tags_uses_reverse_through_index(self):
+        """Test filtering recipes by tags walks the through table index."""
+        plan = Recipe.objects.filter(
+            user=self.user,
+            tags__id__in=self.tag_ids,
+        ).order_by('-id').distinct().explain()
+
+        self.assertIn('core_recipe_tags_tag_recipe_idx', plan)
+
+    def test_filter_by_ingredients_uses_reverse_through_index(self):
+        """Test filtering recipes by ingredients walks the through index."""
+        plan = Recipe.objects.filter(
+            user=self.user,
+            ingredients__id__in=self.ingredient_ids,
+        ).order_by('-id').distinct().explain()
+
+        self.assertIn('core_recipe_ingredients_ingredient_recipe_idx', plan)
+
+    def test_autocomplete_uses_prefix_index(self):
+        """Test name prefix lookups use the pattern ops index."""
+        for model, prefix, index in [
+            (Tag, 'Tag', 'tag_user_name_uniq'),
+            (Ingredient, 'Ingredient', 'ingredient_user_name_uniq'),
+        ]:
+            # Prefix lookups only pay off on users with many names.
+            model.objects.bulk_create(
+                model(user=self.user, name=f'{prefix} {i}')
+                for i in range(300, 5000)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+
+            plan = model.objects.filter(user=self.user).annotate(
+                normalized=normalized_name(),
+            ).filter(
+                normalized__startswith=f'{prefix.lower()} 291',
+            ).order_by(
+                'normalized', 'id',
+            )[:10].explain()
+
+            self.assertIn(index, plan)
+
+    def test_login_email_lookup_uses_upper_index(self):
+        """Test case-insensitive email lookups use the expression index."""
+        plan = get_user_model().objects.filter(
+            email__iexact='USER3@example.com',
+        ).explain()
+
+        self.assertIn('user_email_upper_idx', plan)
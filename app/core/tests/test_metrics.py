@@ -0,0 +1,167 @@
+"""
+Tests for the metrics middleware and endpoint.
+"""
+import json
+import os
+import subprocess
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.metrics import REGISTRY
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MetricsTests(TestCase):
+    """Test request metrics."""
+
+    def setUp(self):
+        REGISTRY.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_per_view_and_action(self):
+        """Test latency, queries and status are labelled by view/action."""
+        self.client.get(RECIPES_URL)
+        self.client.post(RECIPES_URL, {})
+
+        labels = {'view': 'RecipeViewSet', 'action': 'list'}
+        self.assertEqual(
+            REGISTRY.value('http_request_duration_seconds_count', **labels),
+            1,
+        )
+        self.assertEqual(
+            REGISTRY.value('http_requests_total', status=200, **labels), 1,
+        )
+        self.assertEqual(
+            REGISTRY.value('http_request_db_queries_sum', **labels), 1,
+        )
+        self.assertEqual(
+            REGISTRY.value(
+                'http_requests_total',
+                view='RecipeViewSet',
+                action='create',
+                status=400,
+            ),
+            1,
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint(self):
+        """Test metrics are exposed in the Prometheus text format."""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer scrape-token',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_requests_total{action="list",status="200",'
+            'view="RecipeViewSet"} 1',
+            body,
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint_requires_token_or_staff(self):
+        """Test other clients are refused the metrics."""
+        client = APIClient()
+        for headers in [{}, {'HTTP_AUTHORIZATION': 'Bearer wrong-token'}]:
+            res = client.get(METRICS_URL, **headers)
+            self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        client.force_login(self.user)
+        res = client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_endpoint_without_token_setting(self):
+        """Test an empty token doesn't let anyone in."""
+        res = APIClient().get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_start_process_merges_stale_file(self):
+        """Test a worker doesn't take an earlier process's samples."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+            with open(path, 'w') as f:
+                json.dump([['http_requests_total', [], 7]], f)
+
+            metrics.start_process()
+
+            self.assertFalse(os.path.exists(path))
+            samples = metrics.collect()
+
+        self.assertEqual(samples[('http_requests_total', ())], 7)
+
+    def test_collect_merges_exited_processes(self):
+        """Test files of exited workers are folded into one file."""
+        process = subprocess.Popen(['true'])
+        process.wait()
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            for pid, value in [(process.pid, 3), ('aggregate', 4)]:
+                path = os.path.join(directory, f'metrics-{pid}.json')
+                with open(path, 'w') as f:
+                    json.dump([['http_requests_total', [], value]], f)
+
+            first = metrics.collect()
+            second = metrics.collect()
+            files = sorted(os.listdir(directory))
+
+        self.assertEqual(first[('http_requests_total', ())], 7)
+        self.assertEqual(second[('http_requests_total', ())], 7)
+        self.assertEqual(files, sorted([
+            f'metrics-{os.getpid()}.json', 'metrics-aggregate.json',
+            'metrics.lock',
+        ]))
+
+    def test_forked_child_starts_from_zero(self):
+        """Test a forked worker doesn't report its parent's samples."""
+        REGISTRY.add('http_requests_total', (), 1)
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(1 if REGISTRY.samples() else 0)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(REGISTRY.value('http_requests_total'), 1)
+
+    def test_metrics_aggregated_across_processes(self):
+        """Test samples shared by other processes are summed."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            self.client.get(RECIPES_URL)
+            labels = [['action', 'list'], ['status', '200'],
+                      ['view', 'RecipeViewSet']]
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                json.dump([['http_requests_total', labels, 4]], f)
+
+            samples = metrics.collect()
+
+        key = ('http_requests_total', tuple(tuple(pair) for pair in labels))
+        self.assertEqual(samples[key], 5)
@@ -0,0 +1,112 @@
+"""
+Tests for custom middleware.
+"""
+import gzip
+import json
+
+from unittest.mock import patch
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core import middleware
+from core.metrics import REGISTRY
+
+
+PAYLOAD = json.dumps(
+    [{'id': i, 'title': 'Sample recipe title'} for i in range(100)]
+).encode()
+
+
+def get_response(response):
+    """Run a response through the compression middleware."""
+    request = RequestFactory().get(
+        '/api/recipe/recipes/',
+        HTTP_ACCEPT_ENCODING='gzip, deflate',
+    )
+    return middleware.CompressionMiddleware(lambda req: response)(request)
+
+
+@patch.object(middleware, 'brotli', None)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the compression middleware."""
+
+    def setUp(self):
+        REGISTRY.clear()
+
+    def test_choose_encoding(self):
+        """Test negotiating the encoding from Accept-Encoding."""
+        self.assertEqual(middleware.choose_encoding('gzip, br'), 'gzip')
+        self.assertEqual(middleware.choose_encoding('*'), 'gzip')
+        self.assertIsNone(middleware.choose_encoding('gzip;q=0, br'))
+        self.assertIsNone(middleware.choose_encoding(''))
+
+    def test_choose_brotli_when_available(self):
+        """Test brotli is preferred when installed and accepted."""
+        with patch.object(middleware, 'brotli', object()):
+            self.assertEqual(middleware.choose_encoding('gzip, br'), 'br')
+            self.assertEqual(
+                middleware.choose_encoding('gzip, br;q=0.5'), 'gzip',
+            )
+
+    def test_compress_json_response(self):
+        """Test large JSON responses are gzipped."""
+        res = get_response(
+            HttpResponse(PAYLOAD, content_type='application/json')
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(res.content), PAYLOAD)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+
+    @override_settings(COMPRESSION_MIN_SIZE=512)
+    def test_small_response_not_compressed(self):
+        """Test responses below the threshold are left alone."""
+        res = get_response(
+            HttpResponse(b'{"id": 1}', content_type='application/json')
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{"id": 1}')
+
+    def test_compressed_media_not_compressed(self):
+        """Test already compressed media types are skipped."""
+        res = get_response(HttpResponse(PAYLOAD, content_type='image/jpeg'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, PAYLOAD)
+
+    def test_streaming_response_compressed(self):
+        """Test streaming responses are compressed chunk by chunk."""
+        chunks = [PAYLOAD[i:i + 1000] for i in range(0, len(PAYLOAD), 1000)]
+        res = get_response(
+            StreamingHttpResponse(iter(chunks), content_type='text/plain')
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        body = b''.join(res.streaming_content)
+        self.assertEqual(gzip.decompress(body), PAYLOAD)
+
+    def test_metrics_recorded(self):
+        """Test compression ratio and CPU time are exposed as metrics."""
+        res = get_response(
+            HttpResponse(PAYLOAD, content_type='application/json')
+        )
+
+        self.assertEqual(
+            REGISTRY.value('http_compression_bytes_in_total', encoding='gzip'),
+            len(PAYLOAD),
+        )
+        self.assertEqual(
+            REGISTRY.value(
+                'http_compression_bytes_out_total', encoding='gzip',
+            ),
+            len(res.content),
+        )
+        self.assertEqual(
+            REGISTRY.value('http_compression_ratio_count', encoding='gzip'),
+            1,
+        )
+        self.assertIn('http_compression_cpu_seconds_total', REGISTRY.render())
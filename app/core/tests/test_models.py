@@ -108,3 +108,77 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+
+class RecipeCountTests(TestCase):
+    """Test the denormalized recipe counts on tags and ingredients."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = models.Ingredient.objects.create(
+            user=self.user,
+            name='Kale',
+        )
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='Kale salad',
+            time_minutes=10,
+            price=Decimal('4.00'),
+        )
+
+    def assertCounts(self, tag_count, ingredient_count):
+        self.tag.refresh_from_db()
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, tag_count)
+        self.assertEqual(self.ingredient.recipe_count, ingredient_count)
+
+    def test_add_increments_count(self):
+        """Test adding a tag or ingredient to a recipe counts it once."""
+        self.recipe.tags.add(self.tag)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+        self.assertCounts(1, 1)
+
+    def test_remove_decrements_count(self):
+        """Test removing links decrements only the existing ones."""
+        self.recipe.tags.add(self.tag)
+        self.recipe.tags.remove(self.tag)
+        self.recipe.tags.remove(self.tag)
+
+        self.assertCounts(0, 0)
+
+    def test_clear_decrements_count(self):
+        """Test clearing a recipe's tags and ingredients."""
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        self.recipe.tags.clear()
+        self.recipe.ingredients.clear()
+
+        self.assertCounts(0, 0)
+
+    def test_reverse_changes_update_count(self):
+        """Test changing links from the tag side of the relation."""
+        recipe2 = models.Recipe.objects.create(
+            user=self.user,
+            title='Kale soup',
+            time_minutes=30,
+            price=Decimal('6.00'),
+        )
+        self.tag.recipe_set.add(self.recipe, recipe2)
+        self.assertCounts(2, 0)
+
+        self.tag.recipe_set.remove(recipe2)
+        self.assertCounts(1, 0)
+
+        self.tag.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_delete_recipe_decrements_count(self):
+        """Test deleting a recipe releases its tags and ingredients."""
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        self.recipe.delete()
+
+        self.assertCounts(0, 0)
@@ -0,0 +1,126 @@
+"""
+Tests for hashing passwords with a concurrency limit.
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.forms import AuthenticationForm
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import passwords
+
+
+class HashLimiterTests(SimpleTestCase):
+    """Test limiting concurrent hashes."""
+
+    def test_run_returns_result(self):
+        """Test functions run on the calling thread."""
+        limiter = passwords.HashLimiter(max_workers=1, max_queue=0)
+
+        thread = limiter.run(threading.current_thread)
+
+        self.assertIs(thread, threading.current_thread())
+
+    def test_saturated_limiter_rejects(self):
+        """Test calls beyond the workers and queue fail right away."""
+        limiter = passwords.HashLimiter(max_workers=1, max_queue=1)
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def block():
+            started.release()
+            release.wait()
+
+        threads = [
+            threading.Thread(target=limiter.run, args=(block,))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        # The first call runs, the second waits in the queue.
+        started.acquire()
+
+        with self.assertRaises(passwords.HasherBusy) as cm:
+            limiter.run(block)
+
+        self.assertEqual(cm.exception.status_code, 503)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertIsNone(limiter.run(lambda: None))
+
+
+class EmailBackendTests(TestCase):
+    """Test authenticating with the email backend."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='Test@Example.com',
+            password='testpass123',
+        )
+
+    def test_email_case_ignored(self):
+        """Test the email matches regardless of its case."""
+        user = authenticate(
+            username='test@example.COM', password='testpass123',
+        )
+
+        self.assertEqual(user, self.user)
+
+    def test_wrong_password(self):
+        """Test a wrong password doesn't authenticate."""
+        user = authenticate(username='test@example.com', password='wrong')
+
+        self.assertIsNone(user)
+
+    def test_exact_case_preferred(self):
+        """Test an exact match wins over other spellings of the email."""
+        other = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+
+        user = authenticate(
+            username='test@example.com', password='testpass123',
+        )
+
+        self.assertEqual(user, other)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_upgraded(self):
+        """Test a hash from an older hasher is replaced on login."""
+        with self.settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]):
+            self.user.password = make_password('testpass123')
+        self.user.save()
+
+        user = authenticate(
+            username='test@example.com', password='testpass123',
+        )
+
+        self.assertEqual(user, self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_busy_login_form_error(self):
+        """Test a busy limiter is a form error outside the API."""
+        limiter = passwords.HashLimiter(max_workers=1, max_queue=0)
+        limiter._slots.acquire()
+
+        with patch.object(passwords, '_limiter', limiter):
+            form = AuthenticationForm(data={
+                'username': 'test@example.com',
+                'password': 'testpass123',
+            })
+
+            self.assertFalse(form.is_valid())
+
+        self.assertEqual(
+            form.errors.as_data()['__all__'][0].code, 'hasher_busy',
+        )
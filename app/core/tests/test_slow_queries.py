@@ -0,0 +1,106 @@
+"""
+Tests for the slow query log.
+"""
+import logging
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.slow_queries import MAX_PARAMS_LENGTH, slow_query_log
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1.0)
+class SlowQueryLogTests(TestCase):
+    """Test logging slow queries."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Every query is slow here, keep the test transaction's own
+        # savepoints out of the test output.
+        logger = logging.getLogger('core.slow_queries')
+        for attr, value in [
+            ('handlers', [logging.NullHandler()]),
+            ('propagate', False),
+        ]:
+            patcher = patch.object(logger, attr, value)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    def setUp(self):
+        slow_query_log.reset()
+
+    def test_installed_on_connection(self):
+        """Test every connection times its queries."""
+        self.assertIn(slow_query_log, connection.execute_wrappers)
+
+    def test_slow_query_logged_with_context(self):
+        """Test a slow query is logged with its view and caller."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        slow_query_log.reset()
+
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            client.get(RECIPES_URL)
+
+        message = logs.output[0]
+        self.assertIn('view RecipeViewSet.list', message)
+        self.assertIn('FROM "core_recipe"', message)
+        self.assertIn('Params: (<int>)', message)
+        self.assertNotIn(str(user.id), message.split('Params:')[1])
+
+    @override_settings(SLOW_QUERY_LOG_PARAMS=True)
+    def test_params_logged_truncated_when_enabled(self):
+        """Test params are logged, truncated, when asked for."""
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            get_user_model().objects.filter(email='x' * 1000).exists()
+
+        params = logs.output[0].split('Params: ')[1].splitlines()[0]
+        self.assertTrue(params.startswith("('xxx"))
+        self.assertTrue(params.endswith('...'))
+        self.assertLessEqual(len(params), MAX_PARAMS_LENGTH + 3)
+
+    @override_settings(SLOW_QUERY_EXPLAIN=True)
+    def test_explain_captured(self):
+        """Test the query plan is captured for SELECT queries."""
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            get_user_model().objects.filter(email='test@example.com').exists()
+
+        self.assertIn('Plan:', logs.output[0])
+        self.assertIn('actual time', logs.output[0])
+        self.assertIn('in test_explain_captured', logs.output[0])
+
+    @override_settings(SLOW_QUERY_MAX_PER_MINUTE=2)
+    def test_rate_limited(self):
+        """Test no more than the maximum are logged per minute."""
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            for _ in range(5):
+                get_user_model().objects.exists()
+
+        self.assertEqual(len(logs.output), 2)
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0.0)
+    def test_sampled(self):
+        """Test slow queries outside the sample aren't logged."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.slow_queries', 'WARNING'):
+                get_user_model().objects.exists()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60000)
+    def test_fast_query_not_logged(self):
+        """Test queries below the threshold aren't logged."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.slow_queries', 'WARNING'):
+                get_user_model().objects.exists()
@@ -0,0 +1,149 @@
+"""
+Tests for the per-user recipe summaries.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeSummary
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeSummaryTests(TestCase):
+    """Test summaries follow recipe writes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, time_minutes, price):
+        """Create a recipe through the API and return its ID."""
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': time_minutes,
+            'price': price,
+        }, format='json')
+        return res.data['id']
+
+    def assertSummary(self, count, time_minutes, price):
+        """Check the summary against count, (sum, min, max) pairs."""
+        summary = RecipeSummary.objects.get(user=self.user)
+        self.assertEqual(summary.recipe_count, count)
+        self.assertEqual(
+            (summary.time_minutes_sum, summary.time_minutes_min,
+             summary.time_minutes_max),
+            time_minutes,
+        )
+        self.assertEqual(
+            (summary.price_sum, summary.price_min, summary.price_max),
+            tuple(None if p is None else Decimal(p) for p in price),
+        )
+
+    def test_create(self):
+        """Test created recipes are added to the summary."""
+        self.create(10, '2.50')
+        self.create(30, '7.00')
+
+        self.assertSummary(2, (40, 10, 30), ('9.50', '2.50', '7.00'))
+
+    def test_update(self):
+        """Test changing the extremes looks them up again."""
+        first = self.create(10, '2.50')
+        self.create(30, '7.00')
+
+        self.client.patch(
+            detail_url(first), {'time_minutes': 50, 'price': '3.00'},
+        )
+
+        self.assertSummary(2, (80, 30, 50), ('10.00', '3.00', '7.00'))
+
+    def test_delete(self):
+        """Test deleted recipes are taken out of the summary."""
+        first = self.create(10, '2.50')
+        second = self.create(30, '7.00')
+
+        self.client.delete(detail_url(first))
+        self.assertSummary(1, (30, 30, 30), ('7.00', '7.00', '7.00'))
+        self.client.delete(detail_url(second))
+        self.assertSummary(0, (0, None, None), ('0', None, None))
+
+    def test_orm_input_coerced(self):
+        """Test recipes saved with strings or floats are summarized."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes='10', price='5.50',
+        )
+        Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=20, price=1.1,
+        )
+        self.assertSummary(2, (30, 10, 20), ('6.60', '1.10', '5.50'))
+
+        recipe.save()
+        recipe.delete()
+
+        self.assertSummary(1, (20, 20, 20), ('1.10', '1.10', '1.10'))
+
+    def test_bulk_delete(self):
+        """Test bulk deletes update the summary."""
+        ids = [self.create(minutes, '1.00') for minutes in (5, 10, 15)]
+
+        self.client.post(BULK_URL, {
+            'operation': 'delete', 'recipes': ids[1:],
+        }, format='json')
+
+        self.assertSummary(1, (5, 5, 5), ('1.00', '1.00', '1.00'))
+
+    def test_rebuild_summaries(self):
+        """Test the command repairs missing and wrong summaries."""
+        self.create(10, '2.50')
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        Recipe.objects.bulk_create([
+            Recipe(user=other, title='Stew', time_minutes=60, price=5),
+        ])
+        RecipeSummary.objects.filter(user=self.user).update(recipe_count=7)
+        out = StringIO()
+
+        call_command('rebuild_summaries', batch_size=1, stdout=out)
+
+        self.assertIn('Rebuilt 2 recipe summaries.', out.getvalue())
+        self.assertSummary(1, (10, 10, 10), ('2.50', '2.50', '2.50'))
+        self.assertEqual(
+            RecipeSummary.objects.get(user=other).time_minutes_sum, 60,
+        )
+        out = StringIO()
+        call_command('rebuild_summaries', stdout=out)
+        self.assertIn('Rebuilt 0 recipe summaries.', out.getvalue())
+
+    def test_seed_data_summaries(self):
+        """Test seeded users get correct summaries."""
+        call_command(
+            'seed_data', users=3, recipes_per_user=5, user_skew=1,
+            stdout=StringIO(),
+        )
+        seeded = list(
+            RecipeSummary.objects.filter(recipe_count=5)
+            .values_list('user_id', flat=True)
+        )
+        out = StringIO()
+
+        call_command('rebuild_summaries', users=seeded, stdout=out)
+
+        self.assertEqual(len(seeded), 3)
+        self.assertIn('Rebuilt 0 recipe summaries.', out.getvalue())
@@ -0,0 +1,164 @@
+"""
+Tests for request throttling.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+CREATE_USER_URL = reverse('user:create')
+
+
+class TokenBucketStoreTests(SimpleTestCase):
+    """Test the shared token bucket store."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'throttle.bin')
+        self.store = throttling.TokenBucketStore(self.path, slots=64)
+
+    def test_bucket_empties_and_refills(self):
+        """Test requests are allowed until the bucket is empty."""
+        results = [
+            self.store.consume('key', 2, 60, now=1000) for _ in range(3)
+        ]
+
+        self.assertEqual(
+            [allowed for allowed, _ in results],
+            [True, True, False],
+        )
+        self.assertAlmostEqual(results[2][1], 30)
+        self.assertTrue(self.store.consume('key', 2, 60, now=1030)[0])
+
+    def test_keys_are_independent(self):
+        """Test each key has its own bucket."""
+        self.store.consume('first', 1, 60, now=1000)
+
+        self.assertFalse(self.store.consume('first', 1, 60, now=1000)[0])
+        self.assertTrue(self.store.consume('second', 1, 60, now=1000)[0])
+
+    def test_store_shared_between_processes(self):
+        """Test another mapping of the same file sees the buckets."""
+        other = throttling.TokenBucketStore(self.path, slots=64)
+        self.store.consume('key', 1, 60, now=1000)
+
+        self.assertFalse(other.consume('key', 1, 60, now=1000)[0])
+
+
+class DefaultStorePathTests(SimpleTestCase):
+    """Test the default location of the token bucket store."""
+
+    def test_path_specific_to_deployment(self):
+        """Test deployments with other databases or keys don't share."""
+        path = throttling.default_store_path()
+        databases = {'default': {'NAME': 'other'}}
+
+        with override_settings(DATABASES=databases):
+            other_database = throttling.default_store_path()
+        with override_settings(SECRET_KEY='other-secret-key'):
+            other_key = throttling.default_store_path()
+
+        self.assertEqual(path, throttling.default_store_path())
+        self.assertNotEqual(path, other_database)
+        self.assertNotEqual(path, other_key)
+        self.assertTrue(path.startswith(tempfile.gettempdir()))
+
+    @override_settings(THROTTLE_STORE_PATH=None)
+    def test_store_uses_default_path(self):
+        """Test the store falls back to the default path."""
+        self.assertEqual(
+            throttling.get_store().path,
+            throttling.default_store_path(),
+        )
+
+
+class ThrottledApiTests(TestCase):
+    """Test throttling on the API."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(
+            THROTTLE_STORE_PATH=os.path.join(tmp.name, 'throttle.bin'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @patch.object(
+        throttling.TokenBucketThrottle,
+        'THROTTLE_RATES',
+        {'user': '100/min', 'recipe': '2/min'},
+    )
+    def test_endpoint_throttled_with_retry_after(self):
+        """Test exceeding an endpoint's rate returns Retry-After."""
+        for _ in range(2):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    @patch.object(
+        throttling.TokenBucketThrottle,
+        'THROTTLE_RATES',
+        {'user': '1/min'},
+    )
+    def test_user_throttled_per_user(self):
+        """Test one user's requests don't use up another user's rate."""
+        self.client.get(RECIPES_URL)
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Sample recipe',
+            'time_minutes': 5,
+            'price': Decimal('5.00'),
+        })
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch.object(
+        throttling.TokenBucketThrottle,
+        'THROTTLE_RATES',
+        {'anon': '1/min'},
+    )
+    def test_anon_throttled_per_address(self):
+        """Test a forged X-Forwarded-For doesn't get a fresh bucket."""
+        client = APIClient()
+        client.post(CREATE_USER_URL, {}, HTTP_X_FORWARDED_FOR='10.0.0.1')
+
+        res = client.post(
+            CREATE_USER_URL, {}, HTTP_X_FORWARDED_FOR='10.0.0.2',
+        )
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = client.post(
+            CREATE_USER_URL, {}, REMOTE_ADDR='10.0.0.3',
+            HTTP_X_FORWARDED_FOR='10.0.0.2',
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,87 @@
+"""
+Tests for warming up workers.
+"""
+import threading
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import warmup
+from recipe import serializers
+from user.serializers import AuthTokenSerializer, UserSerializer
+
+
+READY_URL = reverse('ready')
+
+
+class WarmupTests(TestCase):
+    """Test the warm-up routine and the readiness endpoint."""
+
+    def setUp(self):
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+
+    def test_serializer_classes(self):
+        """Test the serializers of every routed view are found."""
+        classes = warmup.serializer_classes()
+
+        self.assertTrue({
+            serializers.RecipeSerializer,
+            serializers.RecipeDetailSerializer,
+            serializers.RecipeImageSerializer,
+            serializers.TagSerializer,
+            serializers.IngredientSerializer,
+            AuthTokenSerializer,
+            UserSerializer,
+        } <= classes)
+
+    def test_warm_up(self):
+        """Test warming up resolves the routes and marks the worker ready."""
+        self.assertFalse(warmup.is_ready())
+
+        with self.assertLogs('core.warmup', 'INFO') as logs:
+            warmup.start().join()
+
+        self.assertTrue(warmup.is_ready())
+        self.assertIn('routes', logs.output[0])
+
+    def test_warm_up_waits_for_database(self):
+        """Test a database that is down is logged and checked again."""
+        with patch.object(
+            warmup, 'check_databases',
+            side_effect=[OperationalError('down'), None],
+        ) as check, self.assertLogs('core.warmup', 'INFO') as logs:
+            warmup.start(retry_delay=0).join()
+
+        self.assertEqual(check.call_count, 2)
+        self.assertTrue(warmup.is_ready())
+        self.assertIn('Database unavailable', logs.output[0])
+
+    @override_settings(WARMUP='boot')
+    def test_readiness_waits_for_warm_up(self):
+        """Test the readiness endpoint reports 503 until warmed up."""
+        release = threading.Event()
+        with patch.object(
+            warmup, 'check_databases', side_effect=release.wait,
+        ), self.assertLogs('core.warmup', 'INFO'):
+            thread = warmup.start()
+            res = self.client.get(READY_URL)
+
+            self.assertEqual(res.status_code, 503)
+            self.assertEqual(res.json(), {'ready': False})
+
+            release.set()
+            thread.join()
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'ready': True})
+
+    @override_settings(WARMUP=None)
+    def test_ready_without_warm_up(self):
+        """Test workers without warm-up are always ready."""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, 200)
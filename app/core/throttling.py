@@ -0,0 +1,209 @@
+"""
+Request throttling backed by token buckets shared between processes.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import throttling
+
+
+# Slot layout: key hash, tokens left, time of the last update.
+SLOT = struct.Struct('=Qdd')
+
+
+class TokenBucketStore:
+    """
+    Token buckets kept in a memory-mapped file.
+
+    Every worker process on the host maps the same file, so they all see
+    the same buckets. A key hashes to a small group of neighbouring slots
+    that is locked with `fcntl` while it is updated, which keeps each
+    request O(1). When the group is full, the least recently used bucket
+    is recycled, so a forgotten client starts again with a full bucket.
+    """
+
+    def __init__(self, path, slots=65536, probes=4):
+        self.path = path
+        self.slots = slots
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _ensure_open(self):
+        """Map the file, again after a fork so locks belong to us."""
+        if self._pid == os.getpid():
+            return
+        size = self.slots * SLOT.size
+        fd = os.open(
+            self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600,
+        )
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # Zero marks an empty slot.
+        return int.from_bytes(digest, 'little') or 1
+
+    def consume(self, key, capacity, period, now=None):
+        """
+        Take a token from the bucket for `key`.
+
+        The bucket holds up to `capacity` tokens and refills completely
+        every `period` seconds. Return `(allowed, wait)` where `wait` is
+        the number of seconds until the next token is available.
+        """
+        now = time.time() if now is None else now
+        rate = capacity / period
+        key_hash = self._hash(key)
+        first = key_hash % (self.slots - self.probes + 1)
+        start, length = first * SLOT.size, self.probes * SLOT.size
+
+        with self._lock:
+            self._ensure_open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+            try:
+                slot, tokens, updated = None, float(capacity), now
+                oldest = None
+                for offset in range(start, start + length, SLOT.size):
+                    slot_hash, slot_tokens, slot_updated = \
+                        SLOT.unpack_from(self._map, offset)
+                    if slot_hash == key_hash:
+                        slot, tokens, updated = \
+                            offset, slot_tokens, slot_updated
+                        break
+                    if oldest is None or slot_updated < oldest[1]:
+                        oldest = (offset, slot_updated)
+                if slot is None:
+                    slot = oldest[0]
+
+                elapsed = max(now - updated, 0.0)
+                tokens = min(float(capacity), tokens + elapsed * rate)
+                if tokens >= 1:
+                    allowed, wait = True, 0.0
+                    tokens -= 1
+                else:
+                    allowed, wait = False, (1 - tokens) / rate
+                SLOT.pack_into(self._map, slot, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(
+                    self._fd, fcntl.LOCK_UN, length, start, os.SEEK_SET,
+                )
+        return allowed, wait
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def default_store_path():
+    """
+    Return a store path in the temp directory specific to this deployment.
+
+    The name is keyed with `SECRET_KEY` over the code location and the
+    database, so the workers of a deployment share it while other
+    deployments on the host, test runs included, can't use or guess it.
+    """
+    database = settings.DATABASES['default']
+    ident = '|'.join(str(part) for part in [
+        settings.BASE_DIR,
+        database.get('HOST'),
+        database.get('PORT'),
+        database.get('NAME'),
+    ])
+    digest = hashlib.blake2b(
+        ident.encode(), key=settings.SECRET_KEY.encode()[:64], digest_size=16,
+    ).hexdigest()
+    return os.path.join(
+        tempfile.gettempdir(), f'recipe-api-throttle-{digest}.bin',
+    )
+
+
+def get_store():
+    """Return the shared token bucket store configured in settings."""
+    path = getattr(settings, 'THROTTLE_STORE_PATH', None) or \
+        default_store_path()
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = TokenBucketStore(path)
+        return _stores[path]
+
+
+class TokenBucketThrottle(throttling.SimpleRateThrottle):
+    """Throttle requests with a token bucket from the shared store."""
+    wait_seconds = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.wait_seconds = get_store().consume(
+            self.key, self.num_requests, self.duration,
+        )
+        return allowed
+
+    def wait(self):
+        """Return the seconds to wait, used for the Retry-After header."""
+        return self.wait_seconds
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """
+    Limit the overall request rate of each user.
+
+    Anonymous requests are limited per client IP with the `anon` rate.
+    """
+    scope = 'user'
+
+    def get_rate(self):
+        # The scope is picked per request, so the rate is looked up there.
+        return None
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            self.scope = 'user'
+        else:
+            self.scope = 'anon'
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+
+class ScopedRateThrottle(UserRateThrottle):
+    """
+    Limit the rate of each user on a single endpoint.
+
+    Views opt in with a `throttle_scope` attribute naming the rate.
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope or scope not in self.THROTTLE_RATES:
+            return True
+        self.scope = scope
+        self.rate = self.THROTTLE_RATES[scope]
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return TokenBucketThrottle.allow_request(self, request, view)
@@ -0,0 +1,43 @@
+"""
+Views for the core app.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_GET
+
+from core import metrics, warmup
+
+
+def metrics_allowed(request):
+    """Return True for staff users and scrapers sending `METRICS_TOKEN`."""
+    if request.user.is_active and request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return False
+    keyword, _, value = request.META.get('HTTP_AUTHORIZATION', '').partition(
+        ' ',
+    )
+    return keyword == 'Bearer' and hmac.compare_digest(
+        value.encode(), token.encode(),
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """Expose the metrics of every worker in Prometheus text format."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@require_GET
+def readiness_view(request):
+    """Report whether this worker has warmed up and can take traffic."""
+    ready = not getattr(settings, 'WARMUP', None) or warmup.is_ready()
+    return JsonResponse({'ready': ready}, status=200 if ready else 503)
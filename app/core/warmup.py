@@ -0,0 +1,142 @@
+"""
+Warm-up of worker processes, so the first requests aren't slower.
+"""
+import logging
+import threading
+import time
+
+from django.db import DatabaseError, connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before checking a database that was down again.
+RETRY_DELAY = 1.0
+
+_ready = threading.Event()
+
+
+def is_ready():
+    """Return True once this process has finished warming up."""
+    return _ready.is_set()
+
+
+def iter_patterns(resolver=None):
+    """Yield every URL resolver and pattern of the URLconf."""
+    resolver = resolver or get_resolver()
+    yield resolver
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern)
+        else:
+            yield pattern
+
+
+def resolve_urls():
+    """Import the URLconf and compile every route, for both directions."""
+    count = 0
+    for pattern in iter_patterns():
+        # Both are compiled on first access and then cached.
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            pattern.reverse_dict
+        count += 1
+    return count
+
+
+def serializer_classes():
+    """Return the serializer classes used by the routed DRF views."""
+    found = set()
+    for pattern in iter_patterns():
+        if not isinstance(pattern, URLPattern):
+            continue
+        cls = getattr(pattern.callback, 'cls', None)
+        if cls is None:
+            continue
+        if not hasattr(cls, 'get_serializer_class'):
+            if getattr(cls, 'serializer_class', None) is not None:
+                found.add(cls.serializer_class)
+            continue
+        # Viewsets pick the serializer by action.
+        actions = getattr(pattern.callback, 'actions', None) or {None: None}
+        for action in actions.values():
+            view = cls(**getattr(pattern.callback, 'initkwargs', {}))
+            view.action, view.request, view.format_kwarg = action, None, None
+            found.add(view.get_serializer_class())
+    return found
+
+
+def _build_fields(serializer):
+    """Build the fields of a serializer and of its nested serializers."""
+    for field in serializer.fields.values():
+        if isinstance(field, ListSerializer):
+            field = field.child
+        if isinstance(field, BaseSerializer):
+            _build_fields(field)
+
+
+def build_serializers():
+    """Instantiate every serializer, loading the model metadata they use."""
+    classes = serializer_classes()
+    for serializer_class in classes:
+        _build_fields(serializer_class())
+    return len(classes)
+
+
+def check_databases():
+    """Connect to every database once, raising if one is down."""
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        finally:
+            # Connections are per thread, requests can't reuse this one.
+            connection.close()
+
+
+def wait_for_databases(retry_delay=RETRY_DELAY):
+    """Check the databases until they all accept connections."""
+    while True:
+        try:
+            check_databases()
+            return
+        except DatabaseError as exc:
+            logger.warning(
+                'Database unavailable, retrying in %.1f s: %s',
+                retry_delay, exc,
+            )
+            time.sleep(retry_delay)
+
+
+def warm_up(retry_delay=RETRY_DELAY):
+    """
+    Do the work the first requests of a worker would otherwise pay for.
+
+    Routes and serializers are shared by the whole process, so they're
+    built once for every thread. The process is marked ready once the
+    databases accept connections too.
+    """
+    start = time.perf_counter()
+    routes = resolve_urls()
+    serializers = build_serializers()
+    wait_for_databases(retry_delay)
+    _ready.set()
+    logger.info(
+        'Warmed up %d routes and %d serializers in %.0f ms.',
+        routes, serializers, (time.perf_counter() - start) * 1000,
+    )
+
+
+def start(retry_delay=RETRY_DELAY):
+    """
+    Warm up in a background thread, while the worker takes requests.
+
+    /ready reports 503 until it's done, so a load balancer only sends
+    traffic once it is. Run it in each worker, not before forking.
+    """
+    thread = threading.Thread(
+        target=warm_up, args=(retry_delay,), name='warm-up', daemon=True,
+    )
+    thread.start()
+    return thread
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        # Connect the autocomplete, stats and similar recipes cache
+        # invalidation handlers.
+        from recipe import autocomplete  # noqa: F401
+        from recipe import similar  # noqa: F401
+        from recipe import stats  # noqa: F401
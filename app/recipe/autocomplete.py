@@ -0,0 +1,161 @@
+"""
+Prefix lookups for tag and ingredient autocomplete.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.functions import Lower, Trim
+from django.db.models.signals import post_save, post_delete
+
+from core.models import (
+    Tag,
+    Ingredient,
+)
+
+
+# Rows fetched per database lookup. Fetching more than the requested
+# limit lets longer prefixes be answered from memory later on.
+FETCH_SIZE = 50
+
+
+def normalize_name(name):
+    """Return the normalized form of a tag or ingredient name."""
+    return name.strip().lower()
+
+
+def normalized_name():
+    """Return the expression matching the unique index on `name`."""
+    return Lower(Trim('name'))
+
+
+class PrefixCache:
+    """
+    In-process LRU of prefix lookups, grouped per user.
+
+    An entry is complete when the database returned every row that
+    matches its prefix. A complete entry answers any longer prefix by
+    filtering in memory, the way walking down a trie would.
+
+    Entries expire after `ttl` seconds, which bounds how stale a worker
+    can be after another process changes a user's names.
+    """
+
+    def __init__(self, max_users=1024, max_prefixes=64, ttl=30):
+        self.max_users = max_users
+        self.max_prefixes = max_prefixes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def _prefixes(self, key):
+        """Return the live prefix map for `key`, dropping expired ones."""
+        entry = self._users.get(key)
+        if entry is None:
+            return None
+        created, prefixes = entry
+        if time.monotonic() - created > self.ttl:
+            del self._users[key]
+            return None
+        self._users.move_to_end(key)
+        return prefixes
+
+    def get(self, key, prefix, limit):
+        """Return cached matches for `prefix`, or None on a miss."""
+        with self._lock:
+            prefixes = self._prefixes(key)
+            if prefixes is None:
+                return None
+            for length in range(len(prefix), -1, -1):
+                cached = prefixes.get(prefix[:length])
+                if cached is None:
+                    continue
+                rows, complete = cached
+                if length == len(prefix):
+                    if complete or len(rows) >= limit:
+                        prefixes.move_to_end(prefix)
+                        return rows[:limit]
+                    return None
+                if complete:
+                    rows = [row for row in rows if row[2].startswith(prefix)]
+                    self._store(prefixes, prefix, rows, True)
+                    return rows[:limit]
+            return None
+
+    def put(self, key, prefix, rows, complete):
+        """Cache the rows matching `prefix` for `key`."""
+        with self._lock:
+            prefixes = self._prefixes(key)
+            if prefixes is None:
+                prefixes = OrderedDict()
+                self._users[key] = (time.monotonic(), prefixes)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._store(prefixes, prefix, rows, complete)
+
+    def _store(self, prefixes, prefix, rows, complete):
+        prefixes[prefix] = (rows, complete)
+        prefixes.move_to_end(prefix)
+        while len(prefixes) > self.max_prefixes:
+            prefixes.popitem(last=False)
+
+    def invalidate(self, key):
+        """Forget everything cached for `key`."""
+        with self._lock:
+            self._users.pop(key, None)
+
+    def clear(self):
+        """Forget everything."""
+        with self._lock:
+            self._users.clear()
+
+
+cache = PrefixCache(
+    ttl=getattr(settings, 'AUTOCOMPLETE_CACHE_TTL', 30),
+)
+
+
+def cache_key(model, user_id):
+    """Return the cache key for a user's tags or ingredients."""
+    return (model._meta.label, user_id)
+
+
+def lookup_prefix(queryset, user, prefix, limit):
+    """Return up to `limit` (id, name) pairs whose name starts with prefix."""
+    prefix = normalize_name(prefix)
+    key = cache_key(queryset.model, user.pk)
+    rows = cache.get(key, prefix, limit)
+    if rows is None:
+        fetch = max(limit, FETCH_SIZE)
+        rows = list(
+            queryset.filter(user=user)
+            .annotate(normalized=normalized_name())
+            .filter(normalized__startswith=prefix)
+            .order_by('normalized', 'id')
+            .values_list('id', 'name', 'normalized')[:fetch]
+        )
+        cache.put(key, prefix, rows, complete=len(rows) < fetch)
+    return [(row_id, name) for row_id, name, _ in rows[:limit]]
+
+
+def invalidate(model, user_id):
+    """Drop cached lookups for a user's tags or ingredients."""
+    cache.invalidate(cache_key(model, user_id))
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate(sender, instance.user_id)
+
+
+for model in (Tag, Ingredient):
+    post_save.connect(
+        _invalidate_on_change,
+        sender=model,
+        dispatch_uid=f'autocomplete_save_{model._meta.label}',
+    )
+    post_delete.connect(
+        _invalidate_on_change,
+        sender=model,
+        dispatch_uid=f'autocomplete_delete_{model._meta.label}',
+    )
@@ -0,0 +1,196 @@
+"""
+Changes applied to many rows at once, each in a single statement.
+"""
+from django.db import connection, transaction
+
+from core import summaries
+from core.models import Recipe
+from core.signals import COUNTED_RELATIONS
+from recipe import similar, stats
+
+
+# Each statement also updates the recipe counts, since changing the
+# through tables directly sends no `m2m_changed` or `pre_delete`.
+# Deleting recipes also returns their totals for the user's summary.
+ADD_LINKS_SQL = '''
+WITH added AS (
+    INSERT INTO {through} (recipe_id, {column})
+    SELECT r.id, t.id
+    FROM {recipe} AS r, {target} AS t
+    WHERE r.user_id = %(user)s AND r.id = ANY(%(recipes)s)
+    AND t.user_id = %(user)s AND t.id = ANY(%(items)s)
+    ON CONFLICT (recipe_id, {column}) DO NOTHING
+    RETURNING {column}
+)
+UPDATE {target} AS t
+SET recipe_count = t.recipe_count + c.n
+FROM (SELECT {column}, COUNT(*) AS n FROM added GROUP BY {column}) AS c
+WHERE t.id = c.{column}
+RETURNING c.n
+'''
+
+REMOVE_LINKS_SQL = '''
+WITH removed AS (
+    DELETE FROM {through} AS l
+    USING {recipe} AS r
+    WHERE l.recipe_id = r.id
+    AND r.user_id = %(user)s AND r.id = ANY(%(recipes)s)
+    AND l.{column} = ANY(%(items)s)
+    RETURNING l.{column}
+)
+UPDATE {target} AS t
+SET recipe_count = t.recipe_count - c.n
+FROM (SELECT {column}, COUNT(*) AS n FROM removed GROUP BY {column}) AS c
+WHERE t.id = c.{column}
+RETURNING c.n
+'''
+
+DELETE_RECIPES_SQL = '''
+WITH recipes AS (
+    DELETE FROM {recipe}
+    WHERE user_id = %(user)s AND id = ANY(%(recipes)s)
+    RETURNING id, time_minutes, price
+){relations}
+SELECT
+    COUNT(*), COALESCE(SUM(time_minutes), 0), MIN(time_minutes),
+    MAX(time_minutes), COALESCE(SUM(price), 0), MIN(price), MAX(price)
+FROM recipes
+'''
+
+TOTALS = [
+    'count', 'time_minutes_sum', 'time_minutes_min', 'time_minutes_max',
+    'price_sum', 'price_min', 'price_max',
+]
+
+# The links of the deleted recipes, removed in the same statement so the
+# deferred foreign keys hold at commit.
+DELETE_RELATION_SQL = ''',
+links_{index} AS (
+    DELETE FROM {through}
+    WHERE recipe_id IN (SELECT id FROM recipes)
+    RETURNING {column}
+),
+counts_{index} AS (
+    UPDATE {target} AS t
+    SET recipe_count = t.recipe_count - c.n
+    FROM (
+        SELECT {column}, COUNT(*) AS n FROM links_{index} GROUP BY {column}
+    ) AS c
+    WHERE t.id = c.{column}
+)'''
+
+MERGE_SQL = '''
+WITH moved AS (
+    DELETE FROM {through}
+    WHERE {column} = ANY(%(sources)s)
+    RETURNING recipe_id
+),
+added AS (
+    INSERT INTO {through} (recipe_id, {column})
+    SELECT DISTINCT recipe_id, %(target)s FROM moved
+    ON CONFLICT (recipe_id, {column}) DO NOTHING
+    RETURNING recipe_id
+)
+UPDATE {target}
+SET recipe_count = recipe_count + (SELECT COUNT(*) FROM added)
+WHERE id = %(target)s
+RETURNING recipe_count
+'''
+
+
+def _relation(model):
+    """Return the through table and its column linking recipes to `model`."""
+    for through, (target, column) in COUNTED_RELATIONS.items():
+        if target is model:
+            return through, column
+    raise ValueError(f'Recipes are not linked to {model.__name__}.')
+
+
+def _change_links(sql, user, recipe_ids, model, ids):
+    """Run `sql` on the links of recipes to `model` and count them."""
+    through, column = _relation(model)
+    sql = sql.format(
+        through=through._meta.db_table,
+        column=column,
+        recipe=Recipe._meta.db_table,
+        target=model._meta.db_table,
+    )
+    params = {'user': user.pk, 'recipes': recipe_ids, 'items': ids}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        count = sum(n for n, in cursor.fetchall())
+    stats.invalidate(user.pk)
+    similar.invalidate(user.pk)
+    return count
+
+
+def add_links(user, recipe_ids, model, ids):
+    """
+    Link the user's recipes to the user's tags or ingredients.
+
+    `model` is `Tag` or `Ingredient`. IDs of other users' rows are
+    ignored, as are links that already exist. Returns the number of
+    links added.
+    """
+    return _change_links(ADD_LINKS_SQL, user, recipe_ids, model, ids)
+
+
+def remove_links(user, recipe_ids, model, ids):
+    """Unlink the user's recipes from tags or ingredients, see `add_links`."""
+    return _change_links(REMOVE_LINKS_SQL, user, recipe_ids, model, ids)
+
+
+def delete_recipes(user, recipe_ids):
+    """Delete the user's recipes with the given IDs and count them."""
+    relations = ''.join(
+        DELETE_RELATION_SQL.format(
+            index=index,
+            through=through._meta.db_table,
+            column=column,
+            target=target._meta.db_table,
+        )
+        for index, (through, (target, column))
+        in enumerate(COUNTED_RELATIONS.items())
+    )
+    sql = DELETE_RECIPES_SQL.format(
+        recipe=Recipe._meta.db_table, relations=relations,
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, {'user': user.pk, 'recipes': recipe_ids})
+        totals = dict(zip(TOTALS, cursor.fetchone()))
+        summaries.subtract(user.pk, totals)
+    stats.invalidate(user.pk)
+    similar.invalidate(user.pk)
+    return totals['count']
+
+
+def merge_into(target, source_ids):
+    """
+    Merge the user's tags or ingredients with `source_ids` into `target`.
+
+    Recipes linked to a source are linked to `target` instead, once
+    even if they were linked to several of them, and the sources are
+    deleted. Returns the number of sources merged.
+    """
+    model = type(target)
+    through, column = _relation(model)
+    sql = MERGE_SQL.format(
+        through=through._meta.db_table,
+        column=column,
+        target=model._meta.db_table,
+    )
+    with transaction.atomic():
+        sources = list(
+            model.objects.select_for_update()
+            .filter(user_id=target.user_id, id__in=source_ids)
+            .exclude(pk=target.pk)
+            .values_list('id', flat=True)
+        )
+        if not sources:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'sources': sources, 'target': target.pk})
+            target.recipe_count = cursor.fetchone()[0]
+        # The links are gone, so this only deletes the rows themselves.
+        model.objects.filter(id__in=sources).delete()
+    return len(sources)
@@ -0,0 +1,45 @@
+"""
+Copying recipes together with their tags and ingredients.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+
+from core.signals import COUNTED_RELATIONS
+
+
+COPY_LINKS_SQL = '''
+INSERT INTO {through} (recipe_id, {column})
+SELECT %s, {column}
+FROM {through}
+WHERE recipe_id = %s
+'''
+
+
+def duplicate_recipe(recipe):
+    """
+    Save and return a copy of `recipe` with the same tags and ingredients.
+
+    The links are copied inside the database, so this takes the same
+    number of queries however many tags and ingredients the recipe has.
+    The copy points to the same image file, which is never rewritten in
+    place, so the file needn't be copied either.
+    """
+    source_id = recipe.pk
+    copy = recipe
+    copy.pk = None
+    copy._state.adding = True
+    with transaction.atomic(), connection.cursor() as cursor:
+        copy.save()
+        # Inserting into the through tables directly sends no
+        # `m2m_changed`, so update the recipe counts here as well.
+        for through, (target, column) in COUNTED_RELATIONS.items():
+            sql = COPY_LINKS_SQL.format(
+                through=through._meta.db_table, column=column,
+            )
+            cursor.execute(sql, [copy.pk, source_id])
+            target.objects.filter(
+                pk__in=through.objects.filter(
+                    recipe_id=source_id,
+                ).values(column),
+            ).update(recipe_count=F('recipe_count') + 1)
+    return copy
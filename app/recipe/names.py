@@ -0,0 +1,76 @@
+"""
+Getting or creating tags and ingredients by name.
+"""
+from django.db import connection
+
+from recipe.autocomplete import invalidate
+
+
+# Names are normalized by the database, the way the unique index on
+# (user_id, LOWER(TRIM(name))) sees them. Python's `lower` and `strip`
+# disagree with it on some text, e.g. a final sigma.
+FIND_NAMES_SQL = '''
+SELECT LOWER(TRIM(wanted.name)), wanted.name, existing.id
+FROM unnest(%s::text[]) WITH ORDINALITY AS wanted(name, position)
+LEFT JOIN {table} existing
+    ON existing.user_id = %s
+    AND LOWER(TRIM(existing.name)) = LOWER(TRIM(wanted.name))
+ORDER BY wanted.position
+'''
+
+# Rows another request inserted meanwhile are skipped and looked up again.
+INSERT_NAMES_SQL = '''
+INSERT INTO {table} (user_id, name, recipe_count)
+VALUES {values}
+ON CONFLICT (user_id, LOWER(TRIM(name))) DO NOTHING
+RETURNING LOWER(TRIM(name)), id
+'''
+
+
+def _find(model, user, names):
+    """Return (normalized name, name, id or None) for each of `names`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            FIND_NAMES_SQL.format(table=model._meta.db_table),
+            [list(names), user.pk],
+        )
+        return cursor.fetchall()
+
+
+def get_or_create_name_ids(model, user, names):
+    """
+    Return the IDs of the user's tags or ingredients with `names`.
+
+    Missing rows are created. Names are matched ignoring case and
+    surrounding whitespace, and each row is returned once. Existing rows
+    take one indexed lookup, missing ones one more statement to insert
+    them all.
+    """
+    if not names:
+        return []
+    wanted = {}
+    found = {}
+    for key, name, row_id in _find(model, user, names):
+        wanted.setdefault(key, name)
+        if row_id is not None:
+            found[key] = row_id
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        sql = INSERT_NAMES_SQL.format(
+            table=model._meta.db_table,
+            values=', '.join(['(%s, %s, 0)'] * len(missing)),
+        )
+        params = [
+            value for key in missing for value in (user.pk, wanted[key])
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            found.update(cursor.fetchall())
+        # The insert sends no `post_save`, so drop cached suggestions.
+        invalidate(model, user.pk)
+        taken = [wanted[key] for key in missing if key not in found]
+        if taken:
+            found.update(
+                (key, row_id) for key, _, row_id in _find(model, user, taken)
+            )
+    return [found[key] for key in wanted]
@@ -1,6 +1,11 @@
 """
 Serializers for recipe APIs
 """
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower, Trim
 from rest_framework import serializers
 
 from core.models import (
@@ -8,9 +13,55 @@ from core.models import (
     Tag,
     Ingredient,
 )
+from recipe.autocomplete import normalized_name
+from recipe.names import get_or_create_name_ids
+
+
+class UniqueNameMixin:
+    """Reject renaming to a name the user already has, ignoring case."""
+
+    def _name_taken(self):
+        """Return the error message for a name the user already has."""
+        model = self.Meta.model
+        return (
+            f'{model._meta.verbose_name.capitalize()} with this name '
+            'already exists.'
+        )
+
+    def _save_unique(self, save, *args):
+        """Call `save`, a concurrent save of the same name is a 400."""
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as exc:
+            # The check in validate_name can race, the unique index can't.
+            if 'user_name_uniq' not in str(exc):
+                raise
+            raise serializers.ValidationError({'name': [self._name_taken()]})
+
+    def create(self, validated_data):
+        return self._save_unique(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_unique(super().update, instance, validated_data)
 
+    def validate_name(self, value):
+        """Check no other row of the user has the same normalized name."""
+        # Nested in a recipe, names are matched to existing rows instead.
+        if self.instance is None:
+            return value
+        model = self.Meta.model
+        taken = model.objects.filter(user_id=self.instance.user_id).exclude(
+            pk=self.instance.pk,
+        ).annotate(normalized=normalized_name()).filter(
+            normalized=Lower(Trim(Value(value))),
+        )
+        if taken.exists():
+            raise serializers.ValidationError(self._name_taken())
+        return value
 
-class IngredientSerializer(serializers.ModelSerializer):
+
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for ingredients."""
 
     class Meta:
@@ -19,7 +70,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
@@ -49,22 +100,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         This is needed because this is a serializer method.
         """
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.add(*get_or_create_name_ids(
+            Tag, auth_user, [tag['name'] for tag in tags],
+        ))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(*get_or_create_name_ids(
+            Ingredient,
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        ))
 
     def create(self, validated_data):
         """Create and return a new recipe."""
@@ -115,3 +162,126 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    """Serializer for changes to many recipes at once."""
+    OPERATIONS = {
+        'add_tags': 'tags',
+        'remove_tags': 'tags',
+        'add_ingredients': 'ingredients',
+        'remove_ingredients': 'ingredients',
+        'delete': None,
+    }
+    MAX_RECIPES = 1000
+
+    operation = serializers.ChoiceField(choices=list(OPERATIONS))
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPES,
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        required=False,
+    )
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        required=False,
+    )
+
+    def validate(self, attrs):
+        """Check the IDs the operation needs were given."""
+        field = self.OPERATIONS[attrs['operation']]
+        if field is not None and field not in attrs:
+            raise serializers.ValidationError(
+                {field: f"Required for {attrs['operation']}."},
+            )
+        return attrs
+
+
+class IdListField(serializers.CharField):
+    """Comma separated IDs, as sent in query parameters."""
+    default_error_messages = {
+        'invalid_ids': 'Expected a comma separated list of IDs.',
+    }
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not value:
+            return []
+        try:
+            return [int(str_id) for str_id in value.split(',')]
+        except ValueError:
+            self.fail('invalid_ids')
+
+
+class PriceBoundField(serializers.DecimalField):
+    """
+    A bound on recipe prices, of any size or precision.
+
+    Bounds are clamped to the range of the price column and rounded to
+    its decimal places in `rounding`'s direction. Rounding a lower bound
+    up and an upper bound down keeps the same stored prices in range.
+    """
+
+    def __init__(self, rounding, **kwargs):
+        price = Recipe._meta.get_field('price')
+        self.step = Decimal(1).scaleb(-price.decimal_places)
+        self.limit = Decimal(10) ** (
+            price.max_digits - price.decimal_places
+        ) - self.step
+        super().__init__(
+            max_digits=None, decimal_places=None, rounding=rounding, **kwargs,
+        )
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        value = max(-self.limit, min(value, self.limit))
+        return value.quantize(self.step, rounding=self.rounding)
+
+
+# Sort fields of the recipe list, each backed by a (user, field, id) index.
+RECIPE_ORDERING = ['time_minutes', 'price', 'title', 'id']
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Serializer for the query parameters filtering the recipe list."""
+    tags = IdListField(required=False, allow_blank=True)
+    ingredients = IdListField(required=False, allow_blank=True)
+    min_time = serializers.IntegerField(required=False)
+    max_time = serializers.IntegerField(required=False)
+    min_price = PriceBoundField(rounding=ROUND_CEILING, required=False)
+    max_price = PriceBoundField(rounding=ROUND_FLOOR, required=False)
+    ordering = serializers.ChoiceField(
+        choices=[
+            f'{prefix}{field}'
+            for field in RECIPE_ORDERING
+            for prefix in ['', '-']
+        ],
+        default='-id',
+    )
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Serializer for the recipes of a shopping list."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=10000,
+    )
+    stream = serializers.BooleanField(
+        default=False,
+        help_text='Stream the ingredients as JSON lines.',
+    )
+
+
+class MergeSerializer(serializers.Serializer):
+    """Serializer for merging tags or ingredients into another one."""
+    sources = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+    )
@@ -0,0 +1,149 @@
+"""
+Similar recipes from a per-user index of shared tags and ingredients.
+"""
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from core.models import Recipe
+from core.signals import COUNTED_RELATIONS
+
+
+class SimilarityIndex:
+    """
+    Sparse recipe × feature matrix of one user, stored both ways.
+
+    A feature is a tag or an ingredient. `features` holds the rows of
+    the matrix, `postings` its columns. Scoring a recipe walks only the
+    columns of its own features, so a query costs the number of links
+    those features have rather than the number of recipes.
+    """
+
+    def __init__(self, links):
+        self.features = defaultdict(list)
+        self.postings = defaultdict(list)
+        for recipe_id, feature in links:
+            self.features[recipe_id].append(feature)
+            self.postings[feature].append(recipe_id)
+
+    def similar(self, recipe_id, k):
+        """Return `(recipe_id, shared)` for the `k` most similar recipes."""
+        shared = Counter()
+        for feature in self.features.get(recipe_id, ()):
+            shared.update(self.postings[feature])
+        shared.pop(recipe_id, None)
+        # Most shared features first, then the newest recipes.
+        return heapq.nlargest(k, shared.items(), key=lambda i: (i[1], i[0]))
+
+
+def build_index(user_id):
+    """Build the similarity index of a user, one query per through table."""
+    links = []
+    for through, (target, column) in COUNTED_RELATIONS.items():
+        kind = target._meta.model_name
+        rows = through.objects.filter(recipe__user_id=user_id).values_list(
+            'recipe_id', column,
+        )
+        links.extend((recipe_id, (kind, pk)) for recipe_id, pk in rows)
+    return SimilarityIndex(links)
+
+
+class IndexCache:
+    """
+    In-process LRU of similarity indexes, one per user.
+
+    Entries expire after `ttl` seconds, which bounds how stale a worker
+    can be after another process changes a user's recipes. Indexes built
+    while the user's data changed are not stored: invalidations are
+    counted per user while builds for the user are running.
+    """
+
+    def __init__(self, max_users=256, ttl=60):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+        # User ID to `[running builds, invalidations]`, only while building.
+        self._building = {}
+
+    def get(self, user_id):
+        """Return the index of a user, building it on a miss."""
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._indexes.move_to_end(user_id)
+                return entry[1]
+            building = self._building.setdefault(user_id, [0, 0])
+            building[0] += 1
+            version = building[1]
+        index = None
+        try:
+            index = build_index(user_id)
+        finally:
+            with self._lock:
+                building[0] -= 1
+                if not building[0]:
+                    del self._building[user_id]
+                if index is not None and building[1] == version:
+                    self._indexes[user_id] = (time.monotonic(), index)
+                    self._indexes.move_to_end(user_id)
+                    while len(self._indexes) > self.max_users:
+                        self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id):
+        """Forget the index of a user."""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            if user_id in self._building:
+                self._building[user_id][1] += 1
+
+    def clear(self):
+        """Forget every index."""
+        with self._lock:
+            self._indexes.clear()
+
+
+cache = IndexCache(ttl=getattr(settings, 'SIMILAR_RECIPES_CACHE_TTL', 60))
+
+
+def similar_recipes(user, recipe_id, k):
+    """Return `(recipe_id, shared)` for the user's most similar recipes."""
+    return cache.get(user.pk).similar(recipe_id, k)
+
+
+def invalidate(user_id):
+    """Drop the index of a user once the change is committed."""
+    transaction.on_commit(lambda: cache.invalidate(user_id))
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+post_save.connect(
+    _invalidate_on_change,
+    sender=Recipe,
+    dispatch_uid='similar_save_recipe',
+)
+post_delete.connect(
+    _invalidate_on_change,
+    sender=Recipe,
+    dispatch_uid='similar_delete_recipe',
+)
+for through, (target, _) in COUNTED_RELATIONS.items():
+    m2m_changed.connect(
+        _invalidate_on_change,
+        sender=through,
+        dispatch_uid=f'similar_links_{through._meta.label}',
+    )
+    post_delete.connect(
+        _invalidate_on_change,
+        sender=target,
+        dispatch_uid=f'similar_delete_{target._meta.label}',
+    )
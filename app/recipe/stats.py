@@ -0,0 +1,142 @@
+"""
+Per-user recipe statistics, from the summary table and aggregates.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    IntegerField,
+    Value,
+    When,
+)
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from core.models import (
+    Recipe,
+    RecipeSummary,
+    Tag,
+    Ingredient,
+)
+
+
+# Upper bounds of the price buckets, the last bucket has none.
+PRICE_BUCKETS = [Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50')]
+
+# Number of tags and ingredients listed, most used first.
+TOP = 10
+
+
+def cache_key(user_id):
+    """Return the cache key of a user's statistics."""
+    return f'recipe.stats:{user_id}'
+
+
+def _price_distribution(recipes):
+    """Count the recipes in each price bucket with one grouped query."""
+    bucket = Case(
+        *[
+            When(price__lt=edge, then=Value(index))
+            for index, edge in enumerate(PRICE_BUCKETS)
+        ],
+        default=Value(len(PRICE_BUCKETS)),
+        output_field=IntegerField(),
+    )
+    counts = dict(
+        recipes.annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+        .values_list('bucket', 'count')
+    )
+    bounds = [Decimal('0')] + PRICE_BUCKETS + [None]
+    return [
+        {'min': low, 'max': high, 'count': counts.get(index, 0)}
+        for index, (low, high) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def _most_used(model, user):
+    """Return the user's tags or ingredients used by the most recipes."""
+    # The denormalized counts are read from the popular index, instead of
+    # grouping the through table.
+    return list(
+        model.objects.filter(user=user, recipe_count__gt=0)
+        .order_by('-recipe_count', '-name')
+        .values('id', 'name', 'recipe_count')[:TOP]
+    )
+
+
+def _totals(user):
+    """Return the recipe totals of `user` from the summary table."""
+    summary = RecipeSummary.objects.filter(user=user).first()
+    if summary is None or not summary.recipe_count:
+        summary = RecipeSummary(user=user)
+    count = summary.recipe_count
+    avg_time_minutes = avg_price = None
+    if count:
+        avg_time_minutes = summary.time_minutes_sum / count
+        avg_price = (summary.price_sum / count).quantize(Decimal('0.01'))
+    return {
+        'count': count,
+        'avg_time_minutes': avg_time_minutes,
+        'min_time_minutes': summary.time_minutes_min,
+        'max_time_minutes': summary.time_minutes_max,
+        'avg_price': avg_price,
+        'min_price': summary.price_min,
+        'max_price': summary.price_max,
+    }
+
+
+def compute_stats(user):
+    """Return the recipe statistics of `user`, in four queries."""
+    return {
+        'recipes': _totals(user),
+        'price_distribution': _price_distribution(
+            Recipe.objects.filter(user=user),
+        ),
+        'tags': _most_used(Tag, user),
+        'ingredients': _most_used(Ingredient, user),
+    }
+
+
+def get_stats(user):
+    """Return the statistics of `user` from the cache, or compute them."""
+    key = cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(user)
+        cache.set(key, stats, getattr(settings, 'RECIPE_STATS_CACHE_TTL', 300))
+    return stats
+
+
+def invalidate(user_id):
+    """Drop the cached statistics of a user once the change is committed."""
+    # Dropping them earlier could let another request cache the old data.
+    transaction.on_commit(lambda: cache.delete(cache_key(user_id)))
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+for model in (Recipe, Tag, Ingredient):
+    post_save.connect(
+        _invalidate_on_change,
+        sender=model,
+        dispatch_uid=f'stats_save_{model._meta.label}',
+    )
+    post_delete.connect(
+        _invalidate_on_change,
+        sender=model,
+        dispatch_uid=f'stats_delete_{model._meta.label}',
+    )
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(
+        _invalidate_on_change,
+        sender=through,
+        dispatch_uid=f'stats_links_{through._meta.label}',
+    )
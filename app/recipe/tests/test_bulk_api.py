@@ -0,0 +1,150 @@
+"""
+Tests for the bulk recipe API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkRecipeApiTests(TestCase):
+    """Test bulk changes to recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipes = [create_recipe(self.user) for _ in range(3)]
+        self.ids = [recipe.id for recipe in self.recipes]
+
+    def bulk(self, **payload):
+        """Post a bulk change and return the response."""
+        return self.client.post(BULK_URL, payload, format='json')
+
+    def test_add_tags(self):
+        """Test tagging many recipes in one statement."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes[0].tags.add(tag)
+
+        with self.assertNumQueries(1):
+            res = self.bulk(operation='add_tags', recipes=self.ids,
+                            tags=[tag.id])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        for recipe in self.recipes:
+            self.assertEqual(list(recipe.tags.all()), [tag])
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 3)
+
+    def test_remove_tags(self):
+        """Test untagging many recipes."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for recipe in self.recipes:
+            recipe.tags.add(tag)
+
+        res = self.bulk(operation='remove_tags', recipes=self.ids[:2],
+                        tags=[tag.id])
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(list(tag.recipe_set.all()), [self.recipes[2]])
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_add_and_remove_ingredients(self):
+        """Test changing the ingredients of many recipes."""
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Salt', 'Pepper']
+        ]
+        ids = [ingredient.id for ingredient in ingredients]
+
+        res = self.bulk(operation='add_ingredients', recipes=self.ids,
+                        ingredients=ids)
+        self.assertEqual(res.data['count'], 6)
+        res = self.bulk(operation='remove_ingredients', recipes=self.ids,
+                        ingredients=ids[:1])
+        self.assertEqual(res.data['count'], 3)
+
+        for recipe in self.recipes:
+            self.assertEqual(
+                list(recipe.ingredients.all()), ingredients[1:],
+            )
+        self.assertEqual(
+            [i.recipe_count for i in Ingredient.objects.order_by('id')],
+            [0, 3],
+        )
+
+    def test_delete(self):
+        """Test deleting many recipes, releasing their counts."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        for recipe in self.recipes:
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        # The delete, the summary lock and update, in a transaction.
+        with self.assertNumQueries(5):
+            res = self.bulk(operation='delete', recipes=self.ids[:2])
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(list(Recipe.objects.all()), self.recipes[2:])
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+        tag.refresh_from_db()
+        ingredient.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertEqual(ingredient.recipe_count, 1)
+
+    def test_scoped_to_user(self):
+        """Test other users' recipes and tags are left alone."""
+        other_recipe = create_recipe(self.other)
+        other_tag = Tag.objects.create(user=self.other, name='Theirs')
+        tag = Tag.objects.create(user=self.user, name='Mine')
+
+        res = self.bulk(operation='add_tags', recipes=[other_recipe.id],
+                        tags=[tag.id])
+        self.assertEqual(res.data['count'], 0)
+        res = self.bulk(operation='add_tags', recipes=self.ids,
+                        tags=[other_tag.id])
+        self.assertEqual(res.data['count'], 0)
+        res = self.bulk(operation='delete', recipes=[other_recipe.id])
+        self.assertEqual(res.data['count'], 0)
+
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_missing_ids_error(self):
+        """Test tag operations require tag IDs."""
+        res = self.bulk(operation='add_tags', recipes=self.ids)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
@@ -15,9 +15,11 @@ from core.models import (
     Recipe,
 )
 
+from recipe import autocomplete
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 def detail_url(ingredient_id):
@@ -25,6 +27,11 @@ def detail_url(ingredient_id):
     return reverse('recipe:ingredient-detail', args=[ingredient_id])
 
 
+def merge_url(ingredient_id):
+    """Create and return an ingredient merge URL."""
+    return reverse('recipe:ingredient-merge', args=[ingredient_id])
+
+
 def create_user(email='test@example.com', password='testpass123'):
     """Create and return a user."""
     return get_user_model().objects.create_user(email=email, password=password)
@@ -47,6 +54,7 @@ class PrivateIngredientsApiTests(TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
+        autocomplete.cache.clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -142,3 +150,53 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_ingredients_ordered_by_popularity(self):
+        """Test ordering ingredients by the number of recipes using them."""
+        rare = Ingredient.objects.create(user=self.user, name='Salt')
+        common = Ingredient.objects.create(user=self.user, name='Eggs')
+        unused = Ingredient.objects.create(user=self.user, name='Flour')
+        for title in ['Pancakes', 'Omelette']:
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=Decimal('5.00'),
+                user=self.user,
+            )
+            recipe.ingredients.add(common)
+        recipe.ingredients.add(rare)
+
+        res = self.client.get(INGREDIENTS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [common.id, rare.id, unused.id],
+        )
+
+    def test_autocomplete_ingredients(self):
+        """Test suggesting ingredients by case insensitive name prefix."""
+        tomato = Ingredient.objects.create(user=self.user, name='Tomato')
+        Ingredient.objects.create(user=self.user, name='Potato')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': tomato.id, 'name': 'Tomato'}])
+
+    def test_merge_ingredients(self):
+        """Test merging ingredients relinks their recipes."""
+        target = Ingredient.objects.create(user=self.user, name='Salt')
+        source = Ingredient.objects.create(user=self.user, name='Sea salt')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('1'),
+        )
+        recipe.ingredients.add(source)
+
+        res = self.client.post(
+            merge_url(target.id), {'sources': [source.id]}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.ingredients.all()), [target])
+        self.assertFalse(Ingredient.objects.filter(id=source.id).exists())
@@ -38,6 +38,11 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def duplicate_url(recipe_id):
+    """Create and return a recipe duplicate URL."""
+    return reverse('recipe:recipe-duplicate', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe."""
     """
@@ -302,6 +307,67 @@ class PrivateRecipeApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipe_matches_tag_names_ignoring_case(self):
+        """Test tags are matched by normalized name and not duplicated."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 10,
+            'price': Decimal('3.00'),
+            'tags': [
+                {'name': ' vegan'}, {'name': 'Lunch'}, {'name': 'LUNCH'},
+            ],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()), ['Lunch', 'Vegan'],
+        )
+        self.assertIn(vegan, recipe.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_create_recipe_matches_non_ascii_tag_names(self):
+        """Test names are matched the way the database normalizes them."""
+        # Python lowercases the final sigma to 'ς', PostgreSQL to 'σ'.
+        street = Tag.objects.create(user=self.user, name='οδοσ')
+        payload = {
+            'title': 'Souvlaki',
+            'time_minutes': 10,
+            'price': Decimal('3.00'),
+            'tags': [{'name': 'ΟΔΟΣ'}, {'name': 'ΠΛΑΤΕΙΑΣ'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertIn(street, recipe.tags.all())
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_create_recipe_tag_queries_fixed(self):
+        """Test existing tags are found in one query however many."""
+        names = [f'Tag {i}' for i in range(10)]
+        for name in names:
+            Tag.objects.create(user=self.user, name=name)
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 10,
+            'price': Decimal('3.00'),
+        }
+
+        with self.assertNumQueries(10):
+            self.client.post(RECIPES_URL, dict(
+                payload, tags=[{'name': name} for name in names[:1]],
+            ), format='json')
+        with self.assertNumQueries(10):
+            self.client.post(RECIPES_URL, dict(
+                payload, tags=[{'name': name} for name in names],
+            ), format='json')
+
     def test_create_tag_on_update(self):
         """Test creating tag when updating a recipe."""
         recipe = create_recipe(user=self.user)
@@ -428,6 +494,154 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_duplicate_recipe(self):
+        """Test duplicating a recipe copies its tags and ingredients."""
+        recipe = create_recipe(user=self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Dinner']
+        ]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.post(duplicate_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        copy = Recipe.objects.get(id=res.data['id'])
+        self.assertNotEqual(copy.id, recipe.id)
+        self.assertEqual(copy.user, self.user)
+        self.assertEqual(copy.title, recipe.title)
+        self.assertEqual(copy.price, recipe.price)
+        self.assertCountEqual(copy.tags.all(), tags)
+        self.assertCountEqual(copy.ingredients.all(), [ingredient])
+        self.assertCountEqual(recipe.tags.all(), tags)
+        self.assertEqual(res.data, RecipeDetailSerializer(copy).data)
+        for tag in tags:
+            tag.refresh_from_db()
+            self.assertEqual(tag.recipe_count, 2)
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 2)
+
+    def test_duplicate_recipe_fixed_queries(self):
+        """Test duplicating takes the same queries for any number of tags."""
+        small = create_recipe(user=self.user)
+        small.tags.add(Tag.objects.create(user=self.user, name='Tag'))
+        large = create_recipe(user=self.user)
+        large.tags.add(*[
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(10)
+        ])
+        large.ingredients.add(*[
+            Ingredient.objects.create(user=self.user, name=f'Ingr {i}')
+            for i in range(10)
+        ])
+        self.client.post(duplicate_url(small.id))
+
+        with self.assertNumQueries(11):
+            self.client.post(duplicate_url(small.id))
+        with self.assertNumQueries(11):
+            self.client.post(duplicate_url(large.id))
+
+    def test_duplicate_other_users_recipe_error(self):
+        """Test trying to duplicate another users recipe gives error."""
+        new_user = create_user(email='user2@example.com', password='test123')
+        recipe = create_recipe(user=new_user)
+
+        res = self.client.post(duplicate_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_filter_by_time_and_price(self):
+        """Test filtering recipes by time and price ranges."""
+        quick = create_recipe(
+            user=self.user, time_minutes=15, price=Decimal('4.50'),
+        )
+        create_recipe(user=self.user, time_minutes=45, price=Decimal('4.50'))
+        create_recipe(user=self.user, time_minutes=15, price=Decimal('12.00'))
+        create_recipe(user=self.user, time_minutes=5, price=Decimal('4.50'))
+
+        res = self.client.get(RECIPES_URL, {
+            'min_time': '10',
+            'max_time': '30',
+            'max_price': '10',
+        })
+
+        self.assertEqual([r['id'] for r in res.data], [quick.id])
+
+    def test_filter_price_bounds_of_any_size(self):
+        """Test price bounds beyond the column's precision still filter."""
+        cheap = create_recipe(user=self.user, price=Decimal('9.99'))
+        dear = create_recipe(user=self.user, price=Decimal('999.99'))
+
+        for params, expected in [
+            ({'max_price': '1000'}, [dear, cheap]),
+            ({'max_price': '1e999999'}, [dear, cheap]),
+            ({'min_price': '1e-999999'}, [dear, cheap]),
+            ({'max_price': '9.999'}, [cheap]),
+            ({'min_price': '9.991'}, [dear]),
+            ({'min_price': '-1e999999', 'max_price': '9.99'}, [cheap]),
+        ]:
+            with self.subTest(params=params):
+                res = self.client.get(RECIPES_URL, params)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    [r['id'] for r in res.data],
+                    [recipe.id for recipe in expected],
+                )
+
+    def test_filter_rejects_malformed_params(self):
+        """Test malformed filter parameters return a 400."""
+        create_recipe(user=self.user)
+
+        for params in [
+            {'max_time': 'soon'},
+            {'max_price': 'NaN'},
+            {'max_price': 'Infinity'},
+            {'ordering': 'bogus'},
+            {'ordering': '--price'},
+            {'tags': 'abc'},
+            {'ingredients': '1,,2'},
+        ]:
+            with self.subTest(params=params):
+                res = self.client.get(RECIPES_URL, params)
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filters_only_apply_to_list(self):
+        """Test list parameters don't hide recipes from other actions."""
+        recipe = create_recipe(user=self.user, price=Decimal('12.00'))
+
+        res = self.client.get(
+            detail_url(recipe.id), {'max_price': '1', 'tags': 'abc'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], recipe.id)
+
+    def test_ordering(self):
+        """Test sorting recipes with ties broken by id."""
+        first = create_recipe(user=self.user, title='B', price=Decimal('3'))
+        second = create_recipe(user=self.user, title='A', price=Decimal('3'))
+        third = create_recipe(user=self.user, title='C', price=Decimal('1'))
+
+        for ordering, expected in [
+            ('price', [third, first, second]),
+            ('-price', [second, first, third]),
+            ('title', [second, first, third]),
+            ('id', [first, second, third]),
+            ('-id', [third, second, first]),
+        ]:
+            with self.subTest(ordering=ordering):
+                res = self.client.get(RECIPES_URL, {'ordering': ordering})
+
+                self.assertEqual(
+                    [r['id'] for r in res.data],
+                    [recipe.id for recipe in expected],
+                )
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -460,6 +674,23 @@ class ImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_duplicate_shares_image(self):
+        """Test a duplicated recipe uses the same image file."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+
+        res = self.client.post(duplicate_url(self.recipe.id))
+
+        copy = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(copy.image.name, self.recipe.image.name)
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image."""
         url = image_upload_url(self.recipe.id)
@@ -0,0 +1,134 @@
+"""
+Tests for the shopping list API.
+"""
+import json
+from decimal import Decimal
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Ingredient,
+)
+from recipe import views
+
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def create_recipe(user, *ingredients):
+    """Create and return a recipe with ingredients."""
+    recipe = Recipe.objects.create(
+        user=user, title='Sample', time_minutes=10, price=Decimal('1.00'),
+    )
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class ShoppingListApiTests(TestCase):
+    """Test combining the ingredients of recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.salt, self.tofu = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Rice', 'Salt', 'Tofu']
+        ]
+        self.recipes = [
+            create_recipe(self.user, self.rice, self.salt),
+            create_recipe(self.user, self.salt, self.tofu),
+            create_recipe(self.user, self.tofu),
+        ]
+
+    def test_shopping_list(self):
+        """Test ingredients are listed once with their recipe counts."""
+        ids = [recipe.id for recipe in self.recipes[:2]]
+
+        with self.assertNumQueries(1):
+            res = self.client.post(
+                SHOPPING_LIST_URL, {'recipes': ids}, format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.rice.id, 'name': 'Rice', 'recipes': 1},
+            {'id': self.salt.id, 'name': 'Salt', 'recipes': 2},
+            {'id': self.tofu.id, 'name': 'Tofu', 'recipes': 1},
+        ])
+
+    def test_shopping_list_stream(self):
+        """Test streaming the list as JSON lines."""
+        ids = [recipe.id for recipe in self.recipes]
+
+        res = self.client.post(
+            SHOPPING_LIST_URL, {'recipes': ids, 'stream': True},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        items = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [(item['name'], item['recipes']) for item in items],
+            [('Rice', 1), ('Salt', 2), ('Tofu', 2)],
+        )
+
+    @patch.object(views, 'STREAM_CHUNK_SIZE', 1)
+    def test_shopping_list_stream_chunks(self):
+        """Test the stream is sent in chunks rather than line by line."""
+        ids = [recipe.id for recipe in self.recipes]
+
+        res = self.client.post(
+            SHOPPING_LIST_URL, {'recipes': ids, 'stream': True},
+            format='json',
+        )
+
+        self.assertEqual(len(list(res.streaming_content)), 3)
+
+    def test_shopping_list_limited_to_user(self):
+        """Test other users' recipes add nothing to the list."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        pepper = Ingredient.objects.create(user=other, name='Pepper')
+        recipe = create_recipe(other, pepper)
+
+        res = self.client.post(
+            SHOPPING_LIST_URL,
+            {'recipes': [recipe.id, self.recipes[2].id]},
+            format='json',
+        )
+
+        self.assertEqual([item['name'] for item in res.data], ['Tofu'])
+
+
+class JsonLinesTests(SimpleTestCase):
+    """Test buffering JSON lines into chunks."""
+
+    def test_json_lines(self):
+        """Test lines are joined until a chunk reaches its size."""
+        items = [{'id': i} for i in range(5)]
+
+        chunks = list(views.json_lines(items, chunk_size=20))
+
+        self.assertEqual(chunks, [
+            '{"id": 0}\n{"id": 1}\n',
+            '{"id": 2}\n{"id": 3}\n',
+            '{"id": 4}\n',
+        ])
+
+    def test_json_lines_empty(self):
+        """Test no items yield no chunks."""
+        self.assertEqual(list(views.json_lines([])), [])
@@ -0,0 +1,163 @@
+"""
+Tests for the similar recipes API.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import similar
+
+
+def similar_url(recipe_id):
+    """Create and return a similar recipes URL."""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, title):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('1.00'),
+    )
+
+
+class SimilarityIndexTests(SimpleTestCase):
+    """Test scoring with the similarity index."""
+
+    def test_similar(self):
+        """Test recipes are ranked by shared features, then newest."""
+        index = similar.SimilarityIndex([
+            (1, 'a'), (1, 'b'),
+            (2, 'a'), (2, 'b'),
+            (3, 'a'),
+            (4, 'b'),
+            (5, 'c'),
+        ])
+
+        self.assertEqual(index.similar(1, 3), [(2, 2), (4, 1), (3, 1)])
+        self.assertEqual(index.similar(5, 3), [])
+        self.assertEqual(index.similar(6, 3), [])
+
+
+class IndexCacheTests(SimpleTestCase):
+    """Test the per-process cache of similarity indexes."""
+
+    def setUp(self):
+        self.cache = similar.IndexCache(max_users=2)
+
+    def test_index_changed_while_building_not_stored(self):
+        """Test an index invalidated during its build is built again."""
+        def build(user_id):
+            self.cache.invalidate(user_id)
+            return similar.SimilarityIndex([])
+
+        with patch.object(similar, 'build_index', side_effect=build) as b:
+            self.cache.get(1)
+            self.cache.get(1)
+
+        self.assertEqual(b.call_count, 2)
+
+    def test_no_bookkeeping_left(self):
+        """Test invalidating many users leaves nothing behind."""
+        with patch.object(
+            similar, 'build_index', return_value=similar.SimilarityIndex([]),
+        ):
+            for user_id in range(100):
+                self.cache.get(user_id)
+                self.cache.invalidate(user_id)
+                self.cache.invalidate(user_id + 1000)
+
+        self.assertEqual(self.cache._building, {})
+        self.assertEqual(len(self.cache._indexes), 0)
+
+
+class SimilarRecipesApiTests(TestCase):
+    """Test the similar recipes API."""
+
+    def setUp(self):
+        similar.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.recipe = create_recipe(self.user, 'Curry')
+        self.recipe.tags.add(vegan, dinner)
+        self.recipe.ingredients.add(rice)
+        self.close = create_recipe(self.user, 'Stir fry')
+        self.close.tags.add(vegan, dinner)
+        self.close.ingredients.add(rice)
+        self.far = create_recipe(self.user, 'Salad')
+        self.far.tags.add(vegan)
+        self.unrelated = create_recipe(self.user, 'Cake')
+
+    def test_similar_recipes(self):
+        """Test recipes sharing the most tags and ingredients come first."""
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['id'], item['shared']) for item in res.data],
+            [(self.close.id, 3), (self.far.id, 1)],
+        )
+        self.assertEqual(res.data[0]['title'], 'Stir fry')
+
+    def test_similar_recipes_limit(self):
+        """Test the number of similar recipes is limited by `k`."""
+        res = self.client.get(similar_url(self.recipe.id), {'k': 1})
+
+        self.assertEqual([item['id'] for item in res.data], [self.close.id])
+
+    def test_similar_recipes_cached(self):
+        """Test the index is only built once."""
+        self.client.get(similar_url(self.recipe.id))
+
+        # The recipe, the matches and their tags and ingredients.
+        with self.assertNumQueries(4):
+            self.client.get(similar_url(self.far.id))
+
+    def test_similar_recipes_see_changes(self):
+        """Test changing a recipe's tags rebuilds the index."""
+        self.client.get(similar_url(self.recipe.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                detail_url(self.unrelated.id),
+                {'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}]},
+                format='json',
+            )
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [self.close.id, self.unrelated.id, self.far.id],
+        )
+
+    def test_similar_other_users_recipe_error(self):
+        """Test similar recipes of another user's recipe are not found."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        recipe = create_recipe(other, 'Theirs')
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
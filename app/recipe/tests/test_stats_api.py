@@ -0,0 +1,128 @@
+"""
+Tests for the recipe statistics API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+STATS_URL = reverse('recipe:stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicStatsApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required for statistics."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stats(self):
+        """Test statistics are computed over the user's recipes."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        cheap = create_recipe(self.user, time_minutes=10, price=Decimal('2'))
+        mid = create_recipe(self.user, time_minutes=20, price=Decimal('7'))
+        dear = create_recipe(self.user, time_minutes=60, price=Decimal('60'))
+        cheap.tags.add(vegan, dinner)
+        mid.tags.add(vegan)
+        dear.ingredients.add(salt)
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+        )
+        create_recipe(other, time_minutes=500, price=Decimal('500'))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = res.data['recipes']
+        self.assertEqual(recipes['count'], 3)
+        self.assertEqual(recipes['avg_time_minutes'], 30)
+        self.assertEqual(recipes['min_time_minutes'], 10)
+        self.assertEqual(recipes['max_time_minutes'], 60)
+        self.assertEqual(recipes['avg_price'], Decimal('23.00'))
+        self.assertEqual(recipes['max_price'], Decimal('60'))
+        self.assertEqual(
+            [bucket['count'] for bucket in res.data['price_distribution']],
+            [1, 1, 0, 0, 1],
+        )
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Vegan', 2), ('Dinner', 1)],
+        )
+        self.assertEqual(
+            [item['name'] for item in res.data['ingredients']], ['Salt'],
+        )
+
+    def test_stats_without_recipes(self):
+        """Test statistics of a user without recipes."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes']['count'], 0)
+        self.assertIsNone(res.data['recipes']['avg_price'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_stats_cached(self):
+        """Test statistics are served from the cache the second time."""
+        create_recipe(self.user)
+        with self.assertNumQueries(4):
+            self.client.get(STATS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes']['count'], 1)
+
+    def test_stats_invalidated_on_write(self):
+        """Test creating a recipe drops the cached statistics."""
+        self.client.get(STATS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(RECIPES_URL, {
+                'title': 'Soup',
+                'time_minutes': 30,
+                'price': Decimal('4.00'),
+                'tags': [{'name': 'Dinner'}],
+            }, format='json')
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes']['count'], 1)
+        self.assertEqual(res.data['tags'][0]['name'], 'Dinner')
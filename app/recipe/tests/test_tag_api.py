@@ -1,5 +1,6 @@
 """Test for the tag API."""
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -12,10 +13,12 @@ from core.models import (
     Tag, Recipe,
 )
 
+from recipe import autocomplete
 from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 
 def detail_url(tag_id):
@@ -23,6 +26,11 @@ def detail_url(tag_id):
     return reverse('recipe:tag-detail', args=[tag_id])
 
 
+def merge_url(tag_id):
+    """Create and return a tag merge URL."""
+    return reverse('recipe:tag-merge', args=[tag_id])
+
+
 def create_user(email='test@example.com', password='testpass123'):
     """Create and return user."""
     return get_user_model().objects.create_user(
@@ -48,6 +56,7 @@ class PrivateTagApiTests(TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
+        autocomplete.cache.clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -95,6 +104,51 @@ class PrivateTagApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to a name the user has is rejected."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': ' dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data, {'name': ['Tag with this name already exists.']},
+        )
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
+    def test_validate_non_ascii_duplicate_name(self):
+        """Test duplicate names are found the way the database sees them."""
+        # Python lowercases the final sigma to 'ς', PostgreSQL to 'σ'.
+        Tag.objects.create(user=self.user, name='οδοσ')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        serializer = TagSerializer(tag, data={'name': 'ΟΔΟΣ'})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {
+            'name': ['Tag with this name already exists.'],
+        })
+
+    def test_update_tag_duplicate_name_race(self):
+        """Test a name taken after validation is rejected, not a 500."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        # As if another request took the name between check and save.
+        with patch.object(
+            TagSerializer, 'validate_name', side_effect=lambda value: value,
+        ):
+            res = self.client.patch(detail_url(tag.id), {'name': 'DESSERT'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data, {'name': ['Tag with this name already exists.']},
+        )
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -148,3 +202,118 @@ class PrivateTagApiTests(TestCase):
 
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['name'], tag.name)
+
+    def test_tags_ordered_by_popularity(self):
+        """Test ordering tags by the number of recipes using them."""
+        rare = Tag.objects.create(user=self.user, name='Vegan')
+        common = Tag.objects.create(user=self.user, name='Dessert')
+        unused = Tag.objects.create(user=self.user, name='Breakfast')
+        for title in ['Pancakes', 'Omelette']:
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=Decimal('5.00'),
+                user=self.user,
+            )
+            recipe.tags.add(common)
+        recipe.tags.add(rare)
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [common.id, rare.id, unused.id],
+        )
+
+    def test_autocomplete_tags(self):
+        """Test suggesting tags by case insensitive name prefix."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        veggie = Tag.objects.create(user=self.user, name=' veggie ')
+        Tag.objects.create(user=self.user, name='Dessert')
+        other_user = create_user(email='user2@example.com')
+        Tag.objects.create(user=other_user, name='Vegetarian')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'VEG'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['id'] for tag in res.data],
+            [vegan.id, veggie.id],
+        )
+
+    def test_autocomplete_limit(self):
+        """Test the number of suggestions is limited."""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'tag', 'limit': 2})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Tag 0', 'Tag 1'])
+
+    def test_autocomplete_longer_prefix_served_from_cache(self):
+        """Test a longer prefix is answered without the database."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Veggie')
+        self.client.get(AUTOCOMPLETE_URL, {'q': 've'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 'vegg'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Veggie'])
+
+    def test_autocomplete_sees_new_tags(self):
+        """Test creating a tag invalidates cached suggestions."""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 've'})
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 've'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+
+    def test_merge_tags(self):
+        """Test merging tags relinks their recipes and deletes them."""
+        target = Tag.objects.create(user=self.user, name='Tomato')
+        sources = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Tomatoes', 'Tomatos']
+        ]
+        both = Recipe.objects.create(
+            user=self.user, title='Both', time_minutes=5, price=Decimal('1'),
+        )
+        both.tags.add(target, *sources)
+        source_only = Recipe.objects.create(
+            user=self.user, title='Source', time_minutes=5, price=Decimal('1'),
+        )
+        source_only.tags.add(sources[1])
+
+        res = self.client.post(
+            merge_url(target.id),
+            {'sources': [tag.id for tag in sources]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['merged'], 2)
+        self.assertEqual(list(Tag.objects.all()), [target])
+        self.assertEqual(list(both.tags.all()), [target])
+        self.assertEqual(list(source_only.tags.all()), [target])
+        target.refresh_from_db()
+        self.assertEqual(target.recipe_count, 2)
+
+    def test_merge_ignores_other_users_tags(self):
+        """Test tags of other users can't be merged."""
+        target = Tag.objects.create(user=self.user, name='Mine')
+        other = Tag.objects.create(
+            user=create_user(email='other@example.com'), name='Theirs',
+        )
+
+        res = self.client.post(
+            merge_url(target.id), {'sources': [other.id]}, format='json',
+        )
+        self.assertEqual(res.data['merged'], 0)
+        res = self.client.post(
+            merge_url(other.id), {'sources': [target.id]}, format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Tag.objects.count(), 2)
@@ -20,5 +20,6 @@ router.register('ingredient', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
     path('', include(router.urls)),
 ]
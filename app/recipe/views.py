@@ -1,6 +1,11 @@
 """
 Views for the recipe APIs.
 """
+import json
+
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -14,15 +19,52 @@ from rest_framework import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
+from core.authentication import (
+    ExpiringTokenAuthentication,
+    SignedTokenAuthentication,
+)
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
-from recipe import serializers
+from recipe import bulk as bulk_ops
+from recipe import serializers, stats
+from recipe import similar as similarity
+from recipe.autocomplete import lookup_prefix
+from recipe.duplicate import duplicate_recipe
+
+
+# Bytes of JSON lines collected before a chunk of a stream is sent. Each
+# chunk is flushed through compression and written on its own.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def json_lines(items, chunk_size=None):
+    """Yield `items` as JSON lines, in chunks of about `chunk_size`."""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    lines, size = [], 0
+    for item in items:
+        line = json.dumps(item) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines)
+
+
+# Range parameters of the recipe list, with their lookup.
+RECIPE_RANGE_FILTERS = {
+    'min_time': 'time_minutes__gte',
+    'max_time': 'time_minutes__lte',
+    'min_price': 'price__gte',
+    'max_price': 'price__lte',
+}
 
 
 @extend_schema_view(
@@ -38,6 +80,37 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                'min_time',
+                OpenApiTypes.INT,
+                description='Minimum preparation time in minutes',
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='Maximum preparation time in minutes',
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.DECIMAL,
+                description='Minimum price',
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.DECIMAL,
+                description='Maximum price',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=[
+                    f'{prefix}{field}'
+                    for field in serializers.RECIPE_ORDERING
+                    for prefix in ['', '-']
+                ],
+                description='Sort field, prefix with - for descending. '
+                            'Ties are ordered by id in the same direction.',
+            ),
         ]
     )
 )
@@ -49,11 +122,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     """
     Set the authentication class for the RecipeViewSet.
-    The `TokenAuthentication` class is used to authenticate
+    The `ExpiringTokenAuthentication` class is used to authenticate
     the user using a token. The token is obtained when the user
-    logs in and is included in the request header.
+    logs in and is included in the request header. Signed access
+    tokens are accepted as well and need no database lookup.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     """
     Set the permission class for the RecipeViewSet.
     The `IsAuthenticated` class is used to ensure that the user
@@ -64,10 +141,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
     Therefor, the user must have a token in the request header and
     be authenticated to access recipe data.
     """
+    # Rate limit for this endpoint, see `DEFAULT_THROTTLE_RATES`.
+    throttle_scope = 'recipe'
+
+    def _filters(self):
+        """Return the validated filters, malformed ones are a 400."""
+        serializer = serializers.RecipeFilterSerializer(
+            data=self.request.query_params,
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers."""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _ordering(self, ordering):
+        """Return the sort order for the validated `ordering`."""
+        field = ordering.lstrip('-')
+        prefix = ordering[:len(ordering) - len(field)]
+        # Ties are broken by id in the same direction, so the order is
+        # total and stable for keyset pagination, and one scan of the
+        # (user, field, id) index, forwards or backwards, returns it sorted.
+        return list(dict.fromkeys([prefix + field, prefix + 'id']))
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
@@ -75,19 +167,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         We override the `get_queryset` method in the `viewsets.ModelViewSet`
         class to return only the recipes that belong to the authenticated user.
         """
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action != 'list':
+            # Other actions look recipes up by ID, filters don't apply.
+            return queryset.order_by('-id')
+        filters = self._filters()
+        tag_ids = filters.get('tags')
+        ingredient_ids = filters.get('ingredients')
+        if tag_ids:
             # Filtering related fields using the `filter` method
             queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
+        if ingredient_ids:
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        if tag_ids or ingredient_ids:
+            # Joining the through tables can return a recipe more than once.
+            # Without them, the rows are unique and can be read in index
+            # order straight from `recipe_user_id_idx`.
+            queryset = queryset.distinct()
+        return queryset.filter(**{
+            lookup: filters[param]
+            for param, lookup in RECIPE_RANGE_FILTERS.items()
+            if param in filters
+        }).order_by(*self._ordering(filters['ordering']))
 
     def get_serializer_class(self):
         """Return appropriate serializer class."""
@@ -96,13 +197,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # Custom action for uploading an image
         if self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        if self.action == 'bulk':
+            return serializers.RecipeBulkSerializer
+        if self.action == 'shopping_list':
+            return serializers.ShoppingListSerializer
 
         return self.serializer_class
 
+    @transaction.atomic
     def perform_create(self, serializer):
         """Create a new recipe."""
+        # Atomic, so the recipe, its links and the counts and summary
+        # kept by core.signals are saved together.
         serializer.save(user=self.request.user)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        """Update a recipe."""
+        serializer.save()
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe."""
@@ -115,6 +228,90 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(request=None)
+    @action(methods=['POST'], detail=True)
+    def duplicate(self, request, pk=None):
+        """Copy a recipe with its tags, ingredients and image."""
+        recipe = duplicate_recipe(self.get_object())
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'k',
+                OpenApiTypes.INT,
+                description='Number of similar recipes (1-50).',
+            ),
+        ],
+        responses=serializers.RecipeSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes sharing the most tags and ingredients."""
+        recipe = self.get_object()
+        try:
+            k = int(request.query_params.get('k', 10))
+        except ValueError:
+            k = 10
+        k = min(max(k, 1), 50)
+        matches = similarity.similar_recipes(request.user, recipe.pk, k)
+        # The index may lag behind deletes, those recipes are skipped.
+        recipes = Recipe.objects.filter(
+            user=request.user, pk__in=[recipe_id for recipe_id, _ in matches],
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        data = []
+        for recipe_id, shared in matches:
+            if recipe_id in recipes:
+                item = serializers.RecipeSerializer(recipes[recipe_id]).data
+                item['shared'] = shared
+                data.append(item)
+        return Response(data)
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(methods=['POST'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """Combine the ingredients of recipes, counting their recipes."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # One grouped query over the through table. Ingredients belong to
+        # the user of their recipes, so filtering them by user limits the
+        # list to the user's recipes without joining those.
+        ingredients = Ingredient.objects.filter(
+            user=request.user,
+            recipe__id__in=serializer.validated_data['recipes'],
+        ).values('id', 'name').annotate(
+            recipes=Count('recipe'),
+        ).order_by('name', 'id')
+        if not serializer.validated_data['stream']:
+            return Response(list(ingredients))
+        # One JSON object per line, read from a server-side cursor.
+        return StreamingHttpResponse(
+            json_lines(ingredients.iterator(chunk_size=2000)),
+            content_type='application/x-ndjson',
+        )
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(methods=['POST'], detail=False)
+    def bulk(self, request):
+        """Add or remove tags or ingredients of recipes, or delete them."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        operation, recipe_ids = data['operation'], data['recipes']
+        # Each operation is one statement, limited to the user's rows.
+        if operation == 'delete':
+            count = bulk_ops.delete_recipes(request.user, recipe_ids)
+        else:
+            change, field = operation.split('_')
+            change = {
+                'add': bulk_ops.add_links,
+                'remove': bulk_ops.remove_links,
+            }[change]
+            model = Tag if field == 'tags' else Ingredient
+            count = change(request.user, recipe_ids, model, data[field])
+        return Response({'operation': operation, 'count': count})
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -125,8 +322,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['popular'],
+                description='Sort by the number of recipes using the item.',
+            ),
         ]
-    )
+    ),
+    autocomplete=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Case insensitive name prefix to complete.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of suggestions (1-50).',
+            ),
+        ]
+    ),
 )
 class BasicRecipeAttrViewSet(
     mixins.UpdateModelMixin,
@@ -135,8 +352,12 @@ class BasicRecipeAttrViewSet(
     viewsets.GenericViewSet
 ):
     """Manage basic recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'recipe_attr'
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -148,18 +369,61 @@ class BasicRecipeAttrViewSet(
         Filtering the queryset based on the `assigned_only` parameter.
         If `assigned_only` is True, then we only want to return tags or
         ingredients that are associated with at least one recipe.
-        The `recipe__isnull=False` filter ensures that only tags that
-        have a related recipe are included in the queryset.
+        The denormalized `recipe_count` avoids joining and deduplicating
+        the through table, and is backed by a partial index.
         """
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
+        ordering = ['-name']
+        if self.request.query_params.get('ordering') == 'popular':
+            ordering = ['-recipe_count', '-name']
         """
         We override the `get_queryset` method in the `viewsets.GenericViewSet`
         class to return only the tags that belong to the authenticated user.
         """
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by(*ordering)
+
+    def get_serializer_class(self):
+        """Return appropriate serializer class."""
+        if self.action == 'merge':
+            return serializers.MergeSerializer
+        return self.serializer_class
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(methods=['POST'], detail=True)
+    def merge(self, request, pk=None):
+        """Merge the `sources` into this item and delete them."""
+        target = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        merged = bulk_ops.merge_into(
+            target, serializer.validated_data['sources'],
+        )
+        data = self.serializer_class(target).data
+        data['merged'] = merged
+        return Response(data)
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Suggest names starting with the `q` prefix."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = min(max(limit, 1), 50)
+        matches = lookup_prefix(
+            self.queryset,
+            request.user,
+            request.query_params.get('q', ''),
+            limit,
+        )
+        serializer = self.get_serializer(
+            [{'id': pk, 'name': name} for pk, name in matches],
+            many=True,
+        )
+        return Response(serializer.data)
 
 
 class TagViewSet(BasicRecipeAttrViewSet):
@@ -172,3 +436,18 @@ class IngredientViewSet(BasicRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+
+
+class RecipeStatsView(APIView):
+    """Statistics over the authenticated user's recipes."""
+    authentication_classes = [
+        ExpiringTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'recipe'
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request):
+        """Return recipe counts, cook times, prices and most used items."""
+        return Response(stats.get_stats(request.user))
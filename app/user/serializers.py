@@ -1,6 +1,7 @@
 """
 Serializers for the user API View.
 """
+from django.conf import settings
 from django.contrib.auth import (
     get_user_model,
     authenticate
@@ -9,6 +10,13 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core.authentication import (
+    REFRESH_SALT,
+    check_token_user,
+    load_signed_token,
+    use_refresh_token,
+)
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
@@ -77,3 +85,21 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for refreshing signed tokens."""
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        """Check the refresh token and load its user."""
+        payload = load_signed_token(
+            attrs['refresh'], REFRESH_SALT, settings.REFRESH_TOKEN_TTL,
+        )
+        # Refreshing is rare, so check the revocation counter in the
+        # database instead of the cache.
+        user = get_user_model().objects.filter(pk=payload['u']).first()
+        check_token_user(user, payload)
+        use_refresh_token(payload)
+        attrs['user'] = user
+        return attrs
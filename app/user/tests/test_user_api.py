@@ -1,6 +1,8 @@
 """
 Test for the user API.
 """
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -8,6 +10,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.passwords import HasherBusy
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -97,6 +101,36 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_email_case_insensitive(self):
+        """Test the email of the token request may differ in case."""
+        create_user(email='test@example.com', password='goodpass123')
+
+        payload = {
+            'email': 'Test@Example.com',
+            'password': 'goodpass123',
+        }
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertIn('token', res.data)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch('core.passwords.HashLimiter.run')
+    def test_create_token_hasher_busy(self, patched_run):
+        """Test logins are rejected with 503 when hashing is saturated."""
+        patched_run.side_effect = HasherBusy(wait=2)
+        create_user(email='test@example.com', password='goodpass123')
+
+        payload = {
+            'email': 'test@example.com',
+            'password': 'goodpass123',
+        }
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        self.assertEqual(res['Retry-After'], '2')
+
     def test_create_token_blank_password(self):
         """Test posting a blank password returns an error."""
         payload = {
@@ -1,17 +1,26 @@
 """
 Views for the user API.
 """
+from django.db import transaction
 from rest_framework import (
     generics,
-    authentication,
     permissions
 )
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import (
+    ExpiringTokenAuthentication,
+    SignedTokenAuthentication,
+    issue_token,
+    signed_tokens,
+)
+
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    RefreshTokenSerializer,
 )
 
 
@@ -31,6 +40,43 @@ class CreateTokenView(ObtainAuthToken):
     # The default renderer classes are configured in the
     # `REST_FRAMEWORK` setting in settings.py.
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # ObtainAuthToken disables throttling, so restore the defaults.
+    # Logins are expensive (password hashing), so limit them separately.
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'token'
+
+    def post(self, request, *args, **kwargs):
+        """Return the user's token, a new one if it has expired."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+
+class CreateSignedTokenView(CreateTokenView):
+    """Create a signed access token and refresh token for user."""
+
+    def post(self, request, *args, **kwargs):
+        """Return new signed tokens for the user's credentials."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(signed_tokens(serializer.validated_data['user']))
+
+
+class RefreshTokenView(CreateTokenView):
+    """Exchange a refresh token for new signed tokens."""
+    serializer_class = RefreshTokenSerializer
+
+    def get_authenticate_header(self, request):
+        """Answer invalid refresh tokens with 401 rather than 403."""
+        return SignedTokenAuthentication.keyword
+
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        """Return new signed tokens, using up the refresh token."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(signed_tokens(serializer.validated_data['user']))
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -38,7 +84,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     Manage the authenticated user.
     """
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     """